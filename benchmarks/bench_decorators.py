@@ -0,0 +1,75 @@
+"""Overhead of the authentication decorators per command.
+
+Run from the repository root: python -m benchmarks.bench_decorators
+"""
+
+import os
+import tempfile
+import timeit
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import click
+import jwt
+
+from utils import session, util
+from utils.permissions import (
+    ActionType,
+    ResourceType,
+    check_filters,
+    login_required,
+    permission,
+)
+
+SECRET_KEY = "benchmark"
+NUMBER = 5000
+
+
+@click.command()
+@click.option("--assigned", is_flag=True)
+def bare_command(assigned):
+    pass
+
+
+@click.command()
+@click.option("--assigned", is_flag=True)
+@permission(ActionType.READ, resource=ResourceType.CLIENT)
+@check_filters(ResourceType.CLIENT, "assigned")
+@login_required(pass_token=True)
+def decorated_command(token, assigned):
+    pass
+
+
+def run(command):
+    # every command starts with an empty cache in a new process
+    util.decode_token.cache_clear()
+    command.main(["--assigned"], standalone_mode=False)
+
+
+def main():
+    token = jwt.encode(
+        {
+            "id": 1,
+            "role": "sales",
+            "exp": datetime.now(UTC) + timedelta(minutes=30),
+        },
+        SECRET_KEY,
+    )
+    directory = tempfile.TemporaryDirectory()
+    os.environ["EPICEVENT_SESSION"] = os.path.join(directory.name, "session.json")
+    session.write_session({"token": token})
+    with patch("utils.util.SECRET_KEY", SECRET_KEY), directory:
+        with patch("utils.util.get_token", wraps=util.get_token) as mock_get_token:
+            run(decorated_command)
+            token_reads = mock_get_token.call_count
+        bare = timeit.timeit(lambda: run(bare_command), number=NUMBER)
+        decorated = timeit.timeit(lambda: run(decorated_command), number=NUMBER)
+
+    print(f"token reads per command: {token_reads}")
+    print(f"bare command:      {bare / NUMBER * 1e6:8.1f} us")
+    print(f"decorated command: {decorated / NUMBER * 1e6:8.1f} us")
+    print(f"decorator overhead: {(decorated - bare) / NUMBER * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Latency of the listing filters and of the foreign key checks on deletes,
+without and with the indexes declared on the models.
+
+The benchmark resets and seeds its own database, epic_events_bench by default
+(BENCH_DB_NAME), with the credentials of the .env file.
+
+Run from the repository root: python -m benchmarks.bench_indexes [ROWS]
+"""
+
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+from sqlalchemy import create_engine, delete, select, text
+
+from controllers.event_controller import starts_after, starts_before
+from db_config import DB_HOST, DB_PASSWORD, DB_PORT, DB_USER
+from init_db import create_indexes
+from models import Base
+from models.client import Client
+from models.contract import Contract, Status
+from models.event import Event
+
+DB_NAME = os.getenv("BENCH_DB_NAME", "epic_events_bench")
+ROWS = 200_000
+REPEAT = 5
+SALES_ID = 1
+SUPPORT_ID = 2
+# the seeded events take place in 2025
+UPCOMING_FROM = datetime(2025, 3, 1, 12, 0)
+
+SEED = [
+    # 50 sales then 50 support collaborators, ids 1 (sales) and 2 (support)
+    # are the ones the filters are run for
+    """
+    INSERT INTO collaborator (email, password, first_name, name, phone_number, role)
+    SELECT 'collaborator' || i || '@bench.com', 'not a hash', 'Bench', 'Collaborator',
+           '0123456789', CASE WHEN i % 2 = 1 THEN 'SALES' ELSE 'SUPPORT' END::roletype
+    FROM generate_series(1, 100) AS i
+    """,
+    """
+    INSERT INTO client (full_name, email, phone_number, company, sales_contact_id)
+    SELECT 'Client ' || i, 'client' || i || '@bench.com', 'phone' || i, 'Bench',
+           (i % 50) * 2 + 1
+    FROM generate_series(1, :rows) AS i
+    """,
+    # half of the clients have a contract, a fifth of them not paid yet
+    """
+    INSERT INTO contract (total_amount, remaining_amount, status, client_id,
+                          sales_contact_id)
+    SELECT 1000, CASE WHEN i % 5 = 0 THEN 500 ELSE 0 END,
+           (ARRAY['SIGNED', 'PENDING', 'CANCELLED'])[i % 3 + 1]::status, i,
+           (i % 50) * 2 + 1
+    FROM generate_series(1, :rows / 2) AS i
+    """,
+    # half of the contracts have an event, one in twenty without support
+    """
+    INSERT INTO event (start_date, start_time, end_date, end_time, location,
+                       attendees, contract_id, support_contact_id)
+    SELECT DATE '2025-01-01' + i % 365, TIME '10:00', DATE '2025-01-01' + i % 365,
+           TIME '18:00', 'Bench', 100, i,
+           CASE WHEN i % 20 = 0 THEN NULL ELSE (i % 50) * 2 + 2 END
+    FROM generate_series(1, :rows / 4) AS i
+    """,
+]
+
+
+def listings():
+    """The statements of the filtered listings, as built by the controllers."""
+    return [
+        (
+            "get-clients --assigned",
+            select(Client).where(Client.sales_contact_id == SALES_ID),
+        ),
+        (
+            "get-contracts --assigned",
+            select(Contract).where(Contract.sales_contact_id == SALES_ID),
+        ),
+        (
+            "get-contracts --status pending",
+            select(Contract).where(Contract.status == Status.PENDING),
+        ),
+        (
+            "get-contracts --remaining-amount",
+            select(Contract).where(Contract.remaining_amount > 0),
+        ),
+        (
+            "get-events --assign assigned",
+            select(Event).where(Event.support_contact_id == SUPPORT_ID),
+        ),
+        (
+            "get-events --assign assigned --upcoming 7",
+            select(Event)
+            .where(
+                Event.support_contact_id == SUPPORT_ID,
+                starts_after(UPCOMING_FROM),
+                starts_before(UPCOMING_FROM + timedelta(days=7)),
+            )
+            .order_by(Event.start_date, Event.id),
+        ),
+        (
+            "get-events --assign no-contact",
+            select(Event)
+            .where(Event.support_contact_id.is_(None))
+            .order_by(Event.start_date, Event.id),
+        ),
+    ]
+
+
+def deletes(rows):
+    """Deletes checking or updating the referencing rows, rolled back."""
+    return [
+        # no contract, but its client_id is looked up
+        ("delete a client", delete(Client).where(Client.id == rows)),
+        # no event, but its contract_id is looked up
+        ("delete a contract", delete(Contract).where(Contract.id == rows // 2)),
+    ]
+
+
+def create_database():
+    conn = psycopg2.connect(
+        dbname="postgres",
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+    )
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (DB_NAME,))
+        if not cursor.fetchone():
+            cursor.execute(f"CREATE DATABASE {DB_NAME}")
+    conn.close()
+
+
+def seed(engine, rows):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for statement in SEED:
+            conn.execute(text(statement), {"rows": rows})
+
+
+def drop_indexes(engine):
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+
+def median_ms(conn, stmt):
+    timings = []
+    for _ in range(REPEAT):
+        transaction = conn.begin()
+        start = time.perf_counter()
+        result = conn.execute(stmt)
+        if result.returns_rows:
+            result.all()
+        timings.append(time.perf_counter() - start)
+        transaction.rollback()
+    return statistics.median(timings) * 1000
+
+
+def measure(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    with engine.connect() as conn:
+        return {
+            name: median_ms(conn, stmt) for name, stmt in listings() + deletes(rows)
+        }
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    create_database()
+    engine = create_engine(
+        f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
+    print(f"Seeding {rows} clients in {DB_NAME}...")
+    seed(engine, rows)
+
+    drop_indexes(engine)
+    before = measure(engine, rows)
+    create_indexes(engine)
+    after = measure(engine, rows)
+
+    print(f"{'':45} {'no index':>10} {'indexes':>10}")
+    for name in before:
+        print(f"{name + ':':45} {before[name]:8.1f}ms {after[name]:8.1f}ms")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
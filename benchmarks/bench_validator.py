@@ -0,0 +1,114 @@
+"""Throughput of the import validation, in rows per second: the rows checked
+one by one with strptime and uncompiled patterns, as before, then by columns
+with validator.validate_columns.
+
+Run from the repository root: python -m benchmarks.bench_validator [ROWS]
+"""
+
+import re
+import sys
+import time
+from datetime import datetime
+
+from controllers.event_controller import IMPORT_FIELDS, IMPORT_PARSERS
+from validator import validate_columns
+
+ROWS = 100_000
+REPEAT = 3
+
+
+def make_rows(rows):
+    """Event rows as read from an import file, one in ten invalid."""
+    return [
+        {
+            "contract_id": str(i),
+            "start_date": f"2025-{i % 12 + 1:02}-{i % 28 + 1:02}",
+            "start_time": "10:00" if i % 10 else "10h",
+            "end_date": f"2025-{i % 12 + 1:02}-{i % 28 + 1:02}",
+            "end_time": "18:00",
+            "location": "Paris",
+            "attendees": str(i % 500),
+            "support_contact_id": str(i % 50) if i % 2 else None,
+            "note": None,
+        }
+        for i in range(rows)
+    ]
+
+
+def validate_date(date):
+    datetime.strptime(date, "%Y-%m-%d")
+
+
+def validate_time(time):
+    datetime.strptime(time, "%H:%M")
+
+
+def validate_digit(number):
+    if not number.isdigit():
+        raise ValueError("You must enter a number.")
+
+
+def validate_location(location):
+    if not re.match(".+", location):
+        raise ValueError("Missing location.")
+
+
+# the per-row checks of the imports before the validation by columns
+ROW_VALIDATORS = {
+    "contract_id": validate_digit,
+    "start_date": validate_date,
+    "start_time": validate_time,
+    "end_date": validate_date,
+    "end_time": validate_time,
+    "location": validate_location,
+    "attendees": validate_digit,
+}
+
+
+def by_rows(rows):
+    errors = {}
+    for index, row in enumerate(rows):
+        for field, validate in ROW_VALIDATORS.items():
+            try:
+                validate(row[field])
+            except ValueError as e:
+                errors.setdefault(index, []).append(str(e))
+        support_id = row["support_contact_id"]
+        if support_id is not None and not support_id.isdigit():
+            errors.setdefault(index, []).append("You must enter a number.")
+    return errors
+
+
+def by_columns(rows):
+    columns = {field: [row[field] for row in rows] for field in IMPORT_FIELDS}
+    return validate_columns(columns, IMPORT_PARSERS).errors
+
+
+def rows_per_second(validate, rows):
+    best = min(timing(validate, rows) for _ in range(REPEAT))
+    return len(rows) / best
+
+
+def timing(validate, rows):
+    start = time.perf_counter()
+    validate(rows)
+    return time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    rows = make_rows(size)
+    assert by_rows(rows).keys() == by_columns(rows).keys()
+
+    rows_speed = rows_per_second(by_rows, rows)
+    columns_speed = rows_per_second(by_columns, rows)
+    print(f"Validating {size} event rows:")
+    print(f"{'by rows, strptime:':28} {rows_speed:12,.0f} rows/s")
+    print(
+        f"{'by columns, fromisoformat:':28} {columns_speed:12,.0f} rows/s "
+        f"(x{columns_speed / rows_speed:.1f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
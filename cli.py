@@ -1,29 +1,159 @@
+import functools
+import importlib
 import os
 
 import click
 
-import sentry_sdk
-from dotenv import load_dotenv
+# Commands are resolved to their module only when they run, so that
+# `epicevent --help` or `epicevent logout` don't pay for importing every
+# controller (SQLAlchemy, argon2, jwt and the models) and Sentry.
+# name: (module, attribute, short help)
+LAZY_COMMANDS = {
+    "init": ("init_db", "init", "Generate secret key and create database."),
+    "calibrate-hash": (
+        "init_db",
+        "calibrate_hash",
+        "Measure the machine and pick the cost of the password hashes",
+    ),
+    "login": ("controllers.collaborator_controller", "login", "Log the user in."),
+    "logout": ("controllers.collaborator_controller", "logout", "Log the user out."),
+    "create-collaborator": (
+        "controllers.collaborator_controller",
+        "create_collaborator",
+        "Create a new collaborator",
+    ),
+    "update-collaborator": (
+        "controllers.collaborator_controller",
+        "update_collaborator",
+        "Update collaborator",
+    ),
+    "delete-collaborator": (
+        "controllers.collaborator_controller",
+        "delete_collaborator",
+        "Delete collaborator",
+    ),
+    "get-clients": ("controllers.client_controller", "get_clients", "Get all clients"),
+    "search-clients": (
+        "controllers.client_controller",
+        "search_clients",
+        "Search clients by name, company or email",
+    ),
+    "resolve-clients": (
+        "controllers.client_controller",
+        "resolve_clients",
+        "Find the clients of many emails at once",
+    ),
+    "import-clients": (
+        "controllers.client_controller",
+        "import_clients",
+        "Import clients from a CSV or NDJSON file",
+    ),
+    "create-client": (
+        "controllers.client_controller",
+        "create_client",
+        "Create a new client",
+    ),
+    "update-client": (
+        "controllers.client_controller",
+        "update_client",
+        "Update a client",
+    ),
+    "get-contracts": (
+        "controllers.contract_controller",
+        "get_contracts",
+        "Get all contracts",
+    ),
+    "create-contract": (
+        "controllers.contract_controller",
+        "create_contract",
+        "Create a new contract",
+    ),
+    "import-contracts": (
+        "controllers.contract_controller",
+        "import_contracts",
+        "Import contracts from a CSV or NDJSON file",
+    ),
+    "update-contract": (
+        "controllers.contract_controller",
+        "update_contract",
+        "Update a contract",
+    ),
+    "get-events": ("controllers.event_controller", "get_events", "Get all events"),
+    "create-event": (
+        "controllers.event_controller",
+        "create_event",
+        "Create a new event",
+    ),
+    "import-events": (
+        "controllers.event_controller",
+        "import_events",
+        "Import events from a CSV or NDJSON file",
+    ),
+    "update-event": ("controllers.event_controller", "update_event", "Update an event"),
+    "claim-event": (
+        "controllers.event_controller",
+        "claim_event",
+        "Assign the next event without support contact to yourself",
+    ),
+    "shell": ("shell", "shell", "Run commands in a persistent session."),
+    "serve": ("daemon", "serve", "Run a daemon serving the commands."),
+}
 
-load_dotenv()
 
-sentry_sdk.init(
-    dsn=os.getenv("SENTRY_DSN"),
-    send_default_pii=True,
-)
+@functools.cache
+def init_sentry():
+    """Initialize Sentry once per process, right before a command runs."""
+    import sentry_sdk
+    from dotenv import load_dotenv
 
+    load_dotenv()
+    sentry_sdk.init(
+        dsn=os.getenv("SENTRY_DSN"),
+        send_default_pii=True,
+    )
 
-@click.group()
+
+class LazyGroup(click.Group):
+    """Click group importing the module of a command only when it is needed."""
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            module_name, attribute, _ = self.lazy_commands[cmd_name]
+            module = importlib.import_module(module_name)
+            self.add_command(getattr(module, attribute), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        """Like click.Group.format_commands, but reads the short help of the
+        commands not loaded yet from the registry instead of importing them."""
+        rows = []
+        for name in self.list_commands(ctx):
+            command = self.commands.get(name)
+            if command is None:
+                rows.append((name, self.lazy_commands[name][2]))
+            elif not command.hidden:
+                limit = formatter.width - 6 - len(name)
+                rows.append((name, command.get_short_help_str(limit)))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+    def invoke(self, ctx):
+        init_sentry()
+        return super().invoke(ctx)
+
+
+@click.group(cls=LazyGroup, lazy_commands=LAZY_COMMANDS)
 def cli():
     pass
 
-from controllers import (
-    collaborator_controller,
-    client_controller,
-    contract_controller,
-    event_controller,
-)
-from init_db import init_db
 
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,68 @@
+"""Data access with asyncio, for the lookups made many at once. Each query runs
+in its own session on a connection of the async engine, so that several of
+them are in flight at the same time. The commands stay sync and run these
+coroutines with `run`."""
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db_config import get_async_engine
+from models.client import Client
+
+# queries in flight at once, within what the default pool serves without
+# waiting (a pooled connection and 10 overflowing ones)
+MAX_CONCURRENT_QUERIES = 10
+# emails looked up by each query
+EMAIL_BATCH = 100
+
+
+def run(coroutine):
+    """Run a coroutine of the async layer from sync code, and close the
+    connections it opened before its event loop is."""
+
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await get_async_engine().dispose()
+
+    return asyncio.run(main())
+
+
+async def scalars_concurrently(statements, limit=MAX_CONCURRENT_QUERIES):
+    """The rows of each statement, the statements executed concurrently, at
+    most `limit` of them at a time."""
+    engine = get_async_engine()
+    semaphore = asyncio.Semaphore(limit)
+
+    async def fetch(stmt):
+        async with semaphore, AsyncSession(engine) as session:
+            return (await session.scalars(stmt)).all()
+
+    return await asyncio.gather(*(fetch(stmt) for stmt in statements))
+
+
+async def resolve_client_emails(emails, batch_size=EMAIL_BATCH):
+    """Map each email to its client, or to None when no client has it.
+
+    Args:
+        emails (Iterable[str]): The emails to resolve, duplicates are looked up
+                                once.
+        batch_size (int): Emails looked up by each query.
+
+    Returns:
+        dict: The clients by email, in the order of the emails.
+    """
+    resolved = dict.fromkeys(emails)
+    unique = list(resolved)
+    batches = [
+        unique[start : start + batch_size]
+        for start in range(0, len(unique), batch_size)
+    ]
+    statements = [select(Client).where(Client.email.in_(batch)) for batch in batches]
+    for clients in await scalars_concurrently(statements):
+        for client in clients:
+            resolved[client.email] = client
+    return resolved
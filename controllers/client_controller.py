@@ -1,14 +1,15 @@
 import click
-from sqlalchemy import select, or_
+from sqlalchemy import literal, select, or_, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 import validator
-from cli import cli
-from db_config import engine
-from models.client import Client
+from controllers import async_access
+from db_config import get_engine
+from models.client import Client, SEARCH_TEXT
 from models.collaborator import Collaborator
-from utils import util
+from utils import bulk, update, util
+from utils.listing import listing_options
 from utils.permissions import (
     login_required,
     ActionType,
@@ -19,26 +20,67 @@ from utils.permissions import (
 )
 from views import view
 
+IMPORT_PARSERS = bulk.column_parsers(
+    Client,
+    {
+        "full_name": validator.parse_name,
+        "email": validator.parse_email,
+        "phone_number": validator.parse_phone_number,
+        "company": validator.optional(),
+    },
+)
+IMPORT_FIELDS = tuple(IMPORT_PARSERS)
+
+# The valid rows are copied to a staging table, then merged in one statement.
+# The rows conflicting with an existing client are returned to be rejected.
+CREATE_CLIENT_STAGING = """
+CREATE TEMPORARY TABLE client_import (
+    line integer,
+    full_name text,
+    email text,
+    phone_number text,
+    company text
+) ON COMMIT DROP
+"""
+MERGE_CLIENTS = """
+WITH inserted AS (
+    INSERT INTO client (full_name, email, phone_number, company, sales_contact_id)
+    SELECT full_name, email, phone_number, company, :sales_contact_id
+    FROM client_import
+    ORDER BY line
+    ON CONFLICT DO NOTHING
+    RETURNING email
+)
+SELECT line, full_name, email, phone_number, company
+FROM client_import
+WHERE NOT EXISTS (SELECT FROM inserted WHERE inserted.email = client_import.email)
+ORDER BY line
+"""
 
-@cli.command()
+
+@click.command()
 @click.option(
     "--assigned",
     is_flag=True,
     help="Only return clients assigned to current user",
 )
+@listing_options(Client)
 @permission(ActionType.READ, resource=ResourceType.CLIENT)
 @check_filters(ResourceType.CLIENT, "assigned")
 @login_required(pass_token=True)
-def get_clients(token, assigned):
+def get_clients(token, assigned, listing):
     """Get all clients
 
     Args:
         token (str): The token of the current user.
         assigned (bool): If True, only return clients assigned to the current user.
                            This is enabled by using the --assigned flag.
+        listing (ListingOptions): The page to return and how to fetch it, set
+                                  by the --limit, --after, --sort,
+                                  --stream, --format and --fields options.
     """
-    with Session(engine) as session:
-        stmt = select(Client)
+    with Session(get_engine()) as session:
+        stmt = listing.select(Client)
         try:
             collaborator_id = token["id"]
         except KeyError:
@@ -46,19 +88,84 @@ def get_clients(token, assigned):
             return
         if assigned:
             stmt = stmt.where(Client.sales_contact_id == collaborator_id)
-        all_clients = session.execute(stmt).scalars().all()
-        if not all_clients:
+        stmt = listing.apply(stmt, Client.id)
+        listing.display(listing.fetch(session, stmt), "No clients found.")
+
+
+@click.command()
+@click.argument("query")
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Maximum number of results.",
+)
+@permission(ActionType.READ, resource=ResourceType.CLIENT)
+@login_required()
+def search_clients(query, limit):
+    """Search clients by name, company or email
+
+    Args:
+        query (str): The text to look for, which may be misspelled or partial.
+        limit (int): Maximum number of results, the most similar first.
+    """
+    with Session(get_engine()) as session:
+        # <% is true when a word of the search text looks like the query, <<->
+        # is the distance between them: the index returns the nearest matches
+        # first, the search stops once it has found enough of them. Equally
+        # similar clients are not ordered further, a tie breaker would have to
+        # read all of them, e.g. all the clients of a company.
+        search_text = SEARCH_TEXT.self_group()
+        stmt = (
+            select(Client)
+            .where(literal(query).bool_op("<%")(search_text))
+            .order_by(literal(query).op("<<->")(search_text))
+            .limit(limit)
+        )
+        clients = session.scalars(stmt).all()
+        if not clients:
             view.display_message("No clients found.")
-        for client in all_clients:
+        for client in clients:
+            view.display_message(client)
+
+
+@click.command()
+@click.argument("emails", nargs=-1)
+@click.option(
+    "--file",
+    "emails_file",
+    type=click.File(),
+    help="Read the emails from a file, one per line.",
+)
+@permission(ActionType.READ, resource=ResourceType.CLIENT)
+@login_required()
+def resolve_clients(emails, emails_file):
+    """Find the clients of many emails at once
+
+    Args:
+        emails (tuple[str]): The emails of the clients.
+        emails_file (TextIO | None): A file of more emails, set by --file.
+    """
+    if emails_file is not None:
+        emails = (*emails, *filter(None, map(str.strip, emails_file)))
+    if not emails:
+        view.display_error("Give the emails as arguments or with --file.")
+        return
+    clients = async_access.run(async_access.resolve_client_emails(emails))
+    for email, client in clients.items():
+        if client is None:
+            view.display_message(f"No client found with the email {email}.")
+        else:
             view.display_message(client)
 
 
-@cli.command()
+@click.command()
 @permission(ActionType.CREATE, resource=ResourceType.CLIENT)
 @login_required(pass_token=True)
 def create_client(token):
     """Create a new client"""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         client_name = util.ask_for_input(
             "Enter your client full name", validator.validate_name
         )
@@ -90,6 +197,74 @@ def create_client(token):
             view.display_error(str(e))
 
 
+def validate_client_rows(rows, rejects):
+    """Yield the staging rows of the valid clients, write the others to the
+    rejects. An email or phone number can only be used once in a file."""
+    emails, phone_numbers = set(), set()
+    for line, values in bulk.valid_rows(rows, IMPORT_FIELDS, IMPORT_PARSERS, rejects):
+        errors = []
+        if values["email"] in emails:
+            errors.append("Duplicate email in the file.")
+        if values["phone_number"] in phone_numbers:
+            errors.append("Duplicate phone number in the file.")
+        if errors:
+            rejects.write(line, errors, values)
+            continue
+        emails.add(values["email"])
+        phone_numbers.add(values["phone_number"])
+        yield (
+            line,
+            values["full_name"],
+            values["email"],
+            values["phone_number"],
+            values["company"] or "Not specified",
+        )
+
+
+@click.command()
+@bulk.import_options
+@permission(ActionType.CREATE, resource=ResourceType.CLIENT)
+@login_required(pass_token=True)
+def import_clients(token, file, file_format, rejects_path):
+    """Import clients from a CSV or NDJSON file
+
+    Args:
+        token (str): The token of the current user, who becomes the sales
+                     contact of the imported clients.
+        file (str): The file to import, with full_name, email, phone_number
+                    and company columns.
+        file_format (str, optional): csv or ndjson. This is enabled by using
+                                     the --format option.
+        rejects_path (str, optional): Where to write the rejected rows. This
+                                      is enabled by using the --rejects option.
+    """
+    try:
+        token_id = token["id"]
+    except KeyError:
+        view.display_error("No id stocked in the current token. Try to log again.")
+        return
+    with bulk.failing_import(), Session(get_engine()) as session, bulk.RejectWriter(
+        rejects_path, IMPORT_FIELDS
+    ) as rejects:
+        session.execute(text(CREATE_CLIENT_STAGING))
+        rows = validate_client_rows(bulk.read_rows(file, file_format), rejects)
+        # the clients are checked against each other, not against other tables
+        staged = bulk.load(
+            session, rows, list, "client_import", ("line", *IMPORT_FIELDS)
+        )
+        conflicts = session.execute(
+            text(MERGE_CLIENTS), {"sales_contact_id": token_id}
+        ).all()
+        session.commit()
+        for conflict in conflicts:
+            rejects.write(
+                conflict.line,
+                ["A client with this email or phone number already exists."],
+                conflict._asdict(),
+            )
+    bulk.display_summary(staged - len(conflicts), "clients", rejects)
+
+
 def ask_client_id(session):
     email_phone = util.ask_for_input("Enter the client email or phone number ")
     client = session.execute(
@@ -104,12 +279,42 @@ def ask_client_id(session):
     return client
 
 
-@cli.command()
+@click.command()
+@click.option("--id", "client_id", type=int, help="Update the client of this id.")
+@click.option("--where-company", help="Update the clients of this company.")
+@click.option(
+    "--full-name",
+    callback=update.parsed_by(validator.parse_name),
+    help="New full name.",
+)
+@click.option(
+    "--email", callback=update.parsed_by(validator.parse_email), help="New email."
+)
+@click.option(
+    "--phone-number",
+    callback=update.parsed_by(validator.parse_phone_number),
+    help="New phone number.",
+)
+@click.option("--company", help="New company name.")
+@click.option("--sales-contact-id", type=int, help="New sales contact.")
 @permission(ActionType.UPDATE_MINE, resource=ResourceType.CLIENT)
 @login_required(pass_token=True)
-def update_client(token):
-    """Update a client"""
-    with Session(engine) as session:
+def update_client(token, client_id, where_company, **values):
+    """Update a client
+
+    Without options, the client is chosen and edited interactively. With the
+    --id or --where-* options, the new values given as options are set on all
+    the selected clients at once.
+    """
+    selection = update.given(id=client_id, company=where_company)
+    values = update.given(**values)
+    if selection or values:
+        update_clients(token, selection, values)
+        return
+
+    # The client is edited while no connection nor transaction is held, then
+    # saved at the end unless someone else changed it meanwhile.
+    with Session(get_engine()) as session:
         client = ask_client_id(session)
         if not client:
             view.display_error("No client found.")
@@ -123,36 +328,53 @@ def update_client(token):
             view.display_error("This client is not assigned to you")
             return
         view.display_message(f"Updating\n{client}", "blue")
-        while True:
-            choice = int(view.display_edit_client())
-            if 0 <= choice <= 6:
-                if choice == 0:
-                    break
-                elif choice == 1:
-                    client.full_name = util.ask_for_input(
-                        "Full name ", validator.validate_name
-                    )
-                elif choice == 2:
-                    client.email = util.ask_for_input(
-                        "Email ", validator.validate_email
-                    )
-                elif choice == 3:
-                    client.phone_number = util.ask_for_input(
-                        "Phone number ", validator.validate_phone_number
-                    )
-                elif choice == 4:
-                    client.company = util.ask_for_input("Company name ")
-                elif choice == 5:
-                    sales_id = util.ask_for_input(
-                        "Sales contact id ", validator.validate_digit
-                    )
+
+    while True:
+        choice = int(view.display_edit_client())
+        if 0 <= choice <= 6:
+            if choice == 0:
+                break
+            elif choice == 1:
+                client.full_name = util.ask_for_input(
+                    "Full name ", validator.validate_name
+                )
+            elif choice == 2:
+                client.email = util.ask_for_input("Email ", validator.validate_email)
+            elif choice == 3:
+                client.phone_number = util.ask_for_input(
+                    "Phone number ", validator.validate_phone_number
+                )
+            elif choice == 4:
+                client.company = util.ask_for_input("Company name ")
+            elif choice == 5:
+                sales_id = util.ask_for_input(
+                    "Sales contact id ", validator.validate_digit
+                )
+                with Session(get_engine()) as session:
                     collaborator = session.get(Collaborator, sales_id)
-                    if collaborator and collaborator.role.name == RoleType.SALES:
-                        client.sales_contact_id = sales_id
-                    else:
-                        view.display_error("Sales contact id does not exist.")
-            else:
-                view.display_error("Invalid choice.")
+                if collaborator and collaborator.role.name == RoleType.SALES:
+                    client.sales_contact_id = sales_id
+                else:
+                    view.display_error("Sales contact id does not exist.")
+        else:
+            view.display_error("Invalid choice.")
 
-        session.commit()
-        view.display_message(f"{client} has been updated.", "green")
+    with Session(get_engine()) as session:
+        if update.commit_edits(session, client):
+            view.display_message(f"{client} has been updated.", "green")
+
+
+def update_clients(token, selection, values):
+    """Set the values on the selected clients with a single UPDATE, only the
+    clients of the user being updated."""
+    if not update.check_options(values, selection, "clients"):
+        return
+    where = update.matching(Client, selection)
+    where.append(Client.sales_contact_id == token["id"])
+    unmatched = "none of yours matches the selection"
+    if "sales_contact_id" in values:
+        where.append(update.has_role(values["sales_contact_id"], RoleType.SALES))
+        unmatched += " or the new sales contact is not a sales collaborator"
+    with Session(get_engine()) as session:
+        count = update.update_rows(session, Client, values, where)
+    update.display_updated(count, "clients", unmatched)
@@ -1,12 +1,13 @@
+import click
 from argon2.exceptions import VerifyMismatchError
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, update as sql_update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 import validator
-from cli import cli
-from db_config import engine
+from db_config import get_engine
 from models.collaborator import Collaborator
-from utils import util
+from utils import update, util
 from utils.permissions import (
     RoleType,
     login_required,
@@ -17,18 +18,18 @@ from utils.permissions import (
 from views import view
 
 
-@cli.command()
+@click.command()
 @permission(ActionType.CREATE, resource=ResourceType.COLLABORATOR)
 @login_required()
 def create_collaborator():
     """Create a new collaborator"""
-    with Session(engine) as session:
-        collaborator_email = util.ask_for_input(
-            "Enter the collaborator email", validator.validate_email
-        )
-        collaborator_phone_number = util.ask_for_input(
-            "Enter the collaborator phone number ", validator.validate_phone_number
-        )
+    collaborator_email = util.ask_for_input(
+        "Enter the collaborator email", validator.validate_email
+    )
+    collaborator_phone_number = util.ask_for_input(
+        "Enter the collaborator phone number ", validator.validate_phone_number
+    )
+    with Session(get_engine()) as session:
         collaborator = session.execute(
             select(Collaborator).where(
                 or_(
@@ -40,27 +41,34 @@ def create_collaborator():
         if collaborator:
             view.display_error("This email or phone number already exists.")
             return
-        collaborator_password = util.ask_for_password(
-            "Enter the collaborator password ", validator.validate_password
-        )
-        collaborator_name = util.ask_for_input(
-            "Enter the collaborator last_name ", validator.validate_name
-        )
-        collaborator_first_name = util.ask_for_input(
-            "Enter the collaborator first name ", validator.validate_name
-        )
 
-        role = util.choose_from_enum(RoleType)
-        collaborator = Collaborator(
-            collaborator_email,
-            collaborator_password,
-            collaborator_first_name,
-            collaborator_name,
-            collaborator_phone_number,
-            role,
-        )
-        session.add(collaborator)
-        session.commit()
+    # no transaction is held while the rest is asked
+    collaborator_password = util.ask_for_password(
+        "Enter the collaborator password ", validator.validate_password
+    )
+    collaborator_name = util.ask_for_input(
+        "Enter the collaborator last_name ", validator.validate_name
+    )
+    collaborator_first_name = util.ask_for_input(
+        "Enter the collaborator first name ", validator.validate_name
+    )
+    role = util.choose_from_enum(RoleType)
+    collaborator = Collaborator(
+        collaborator_email,
+        collaborator_password,
+        collaborator_first_name,
+        collaborator_name,
+        collaborator_phone_number,
+        role,
+    )
+
+    with Session(get_engine()) as session:
+        try:
+            session.add(collaborator)
+            session.commit()
+        except IntegrityError:
+            # created by someone else while the rest was asked
+            view.display_error("This email or phone number already exists.")
 
 
 def ask_collaborator_id(session):
@@ -77,102 +85,183 @@ def ask_collaborator_id(session):
     return collaborator
 
 
-@cli.command()
+ROLES = [role.value for role in RoleType]
+
+
+@click.command()
+@click.option(
+    "--id", "collaborator_id", type=int, help="Update the collaborator of this id."
+)
+@click.option(
+    "--where-role",
+    type=click.Choice(ROLES),
+    callback=update.parsed_by(RoleType),
+    help="Update the collaborators with this role.",
+)
+@click.option(
+    "--first-name",
+    callback=update.parsed_by(validator.parse_name),
+    help="New first name.",
+)
+@click.option(
+    "--last-name",
+    "name",
+    callback=update.parsed_by(validator.parse_name),
+    help="New last name.",
+)
+@click.option(
+    "--email", callback=update.parsed_by(validator.parse_email), help="New email."
+)
+@click.option(
+    "--phone-number",
+    callback=update.parsed_by(validator.parse_phone_number),
+    help="New phone number.",
+)
+@click.option(
+    "--role",
+    type=click.Choice(ROLES),
+    callback=update.parsed_by(RoleType),
+    help="New role.",
+)
 @permission(ActionType.UPDATE_ALL, resource=ResourceType.COLLABORATOR)
 @login_required()
-def update_collaborator():
-    """Update collaborator"""
-    with Session(engine) as session:
+def update_collaborator(collaborator_id, where_role, **values):
+    """Update collaborator
+
+    Without options, the collaborator is chosen and edited interactively.
+    With the --id or --where-* options, the new values given as options are
+    set on all the selected collaborators at once. Passwords can only be
+    changed interactively, so that they don't end up in the shell history.
+    """
+    selection = update.given(id=collaborator_id, role=where_role)
+    values = update.given(**values)
+    if selection or values:
+        if update.check_options(values, selection, "collaborators"):
+            with Session(get_engine()) as session:
+                count = update.update_rows(
+                    session,
+                    Collaborator,
+                    values,
+                    update.matching(Collaborator, selection),
+                )
+            update.display_updated(count, "collaborators")
+        return
+
+    # The collaborator is edited while no connection nor transaction is held,
+    # then saved at the end unless someone else changed it meanwhile.
+    with Session(get_engine()) as session:
         collaborator = ask_collaborator_id(session)
 
         if collaborator is None:
             view.display_error("No collaborator found.")
             return
-
         view.display_message(f"Updating\n{collaborator}", "blue")
-        while True:
-            choice = int(view.display_edit_collaborator())
-            if 0 <= choice <= 6:
-                if choice == 0:
-                    break
-                elif choice == 1:
-                    collaborator.first_name = util.ask_for_input(
-                        "First name ", validator.validate_name
-                    )
-                elif choice == 2:
-                    collaborator.name = util.ask_for_input(
-                        "Last name ", validator.validate_name
-                    )
-                elif choice == 3:
-                    collaborator.email = util.ask_for_input(
-                        "Email ", validator.validate_email
-                    )
-                elif choice == 4:
-                    collaborator.password = util.hash_password(
-                        util.ask_for_password("Password ", validator.validate_password)
-                    )
-                elif choice == 5:
-                    collaborator.phone_number = util.ask_for_input(
-                        "Phone number ", validator.validate_phone_number
-                    )
-                elif choice == 6:
-                    role = util.choose_from_enum(RoleType)
-                    collaborator.role = role
-            else:
-                view.display_error("Invalid choice.")
-        session.commit()
-        view.display_message(f"{collaborator} has been updated.", "green")
 
+    while True:
+        choice = int(view.display_edit_collaborator())
+        if 0 <= choice <= 6:
+            if choice == 0:
+                break
+            elif choice == 1:
+                collaborator.first_name = util.ask_for_input(
+                    "First name ", validator.validate_name
+                )
+            elif choice == 2:
+                collaborator.name = util.ask_for_input(
+                    "Last name ", validator.validate_name
+                )
+            elif choice == 3:
+                collaborator.email = util.ask_for_input(
+                    "Email ", validator.validate_email
+                )
+            elif choice == 4:
+                collaborator.password = util.hash_password(
+                    util.ask_for_password("Password ", validator.validate_password)
+                )
+            elif choice == 5:
+                collaborator.phone_number = util.ask_for_input(
+                    "Phone number ", validator.validate_phone_number
+                )
+            elif choice == 6:
+                role = util.choose_from_enum(RoleType)
+                collaborator.role = role
+        else:
+            view.display_error("Invalid choice.")
+
+    with Session(get_engine()) as session:
+        if update.commit_edits(session, collaborator):
+            view.display_message(f"{collaborator} has been updated.", "green")
 
-@cli.command()
+
+@click.command()
 @permission(ActionType.DELETE, resource=ResourceType.COLLABORATOR)
 @login_required(pass_token=True)
 def delete_collaborator(token):
     """Delete collaborator"""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         collaborator = ask_collaborator_id(session)
 
         if collaborator is None:
             view.display_error("No collaborator found.")
             return
 
-        choice = util.ask_for_input(
-            f"Are you sure you want to delete {collaborator} ? Y/N"
-        ).lower()
-        if choice in ("y", "yes"):
-            session.delete(collaborator)
-            session.commit()
-            if collaborator.id == token["id"]:
-                logout_user()
+    # no transaction is held while waiting for the confirmation
+    choice = util.ask_for_input(
+        f"Are you sure you want to delete {collaborator} ? Y/N"
+    ).lower()
+    if choice in ("y", "yes"):
+        deleting_self = collaborator.id == token["id"]
+        with Session(get_engine()) as session:
+            if not update.commit_edits(session, collaborator, delete=True):
+                return
+        if deleting_self:
+            logout_user()
 
 
-@cli.command()
+@click.command()
 def login():
     """Log the user in."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         collaborator_login = util.ask_for_input("Please enter your email")
         collaborator = session.execute(
             select(Collaborator).where(Collaborator.email == collaborator_login)
         ).scalar_one_or_none()
-        if collaborator:
-            try:
-                collaborator_password = util.ask_for_password(
-                    "Please enter your password"
-                )
-                util.verify_password(collaborator_password, collaborator.password)
-            except VerifyMismatchError:
-                view.display_error("Incorrect password.")
-                return
-            try:
-                util.create_token(collaborator)
-                view.display_message("Login successful.", "green")
-            except Exception as e:
-                view.display_error(str(e))
-        else:
-            view.display_error("This email is not registered.")
+    # the password is asked once the connection is back in the pool
+    if collaborator:
+        try:
+            collaborator_password = util.ask_for_password("Please enter your password")
+            util.verify_password(collaborator_password, collaborator.password)
+        except VerifyMismatchError:
+            view.display_error("Incorrect password.")
+            return
+        if util.needs_rehash(collaborator.password):
+            rehash_password(collaborator, collaborator_password)
+        try:
+            util.create_token(collaborator)
+            view.display_message("Login successful.", "green")
+        except Exception as e:
+            view.display_error(str(e))
+    else:
+        view.display_error("This email is not registered.")
+
+
+def rehash_password(collaborator, password):
+    """Replace the hash of a password made with an outdated cost. The password
+    stays the same: the version isn't changed, so an edit of the collaborator
+    in progress isn't refused, and a hash changed meanwhile is kept."""
+    with Session(get_engine()) as session:
+        session.execute(
+            sql_update(Collaborator)
+            .where(
+                Collaborator.id == collaborator.id,
+                Collaborator.password == collaborator.password,
+            )
+            .values(password=util.hash_password(password))
+        )
+        session.commit()
 
 
-@cli.command()
+@click.command()
 def logout():
     """Log the user out."""
     logout_user()
@@ -1,14 +1,14 @@
 import click
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 import validator
-from cli import cli
-from db_config import engine
+from db_config import get_engine
 from models.client import Client
 from models.collaborator import Collaborator
 from models.contract import Contract, Status
-from utils import util
+from utils import bulk, update, util
+from utils.listing import listing_options
 from utils.permissions import (
     login_required,
     permission,
@@ -16,12 +16,31 @@ from utils.permissions import (
     ResourceType,
     RoleType,
     check_filters,
-    PermissionManager,
+    get_auth_context,
 )
 from views import view
 
 
-@cli.command()
+def parse_status(status):
+    try:
+        return Status(status)
+    except ValueError:
+        raise ValueError("Status must be signed, pending or cancelled.")
+
+
+STATUSES = [status.value for status in Status]
+
+IMPORT_PARSERS = {
+    "client_id": validator.parse_digit,
+    "total_amount": validator.parse_decimal,
+    "remaining_amount": validator.parse_decimal,
+    "status": parse_status,
+}
+IMPORT_FIELDS = tuple(IMPORT_PARSERS)
+IMPORT_COLUMNS = (*IMPORT_FIELDS, "sales_contact_id")
+
+
+@click.command()
 @click.option(
     "--status",
     type=click.Choice(["signed", "pending", "cancelled"]),
@@ -38,10 +57,11 @@ from views import view
     is_flag=True,
     help="Only return contracts assigned to current user",
 )
+@listing_options(Contract)
 @permission(ActionType.READ, resource=ResourceType.CONTRACT)
 @check_filters(ResourceType.CONTRACT, "status", "remaining_amount", "assigned")
 @login_required(pass_token=True)
-def get_contracts(token, status, remaining_amount, assigned):
+def get_contracts(token, status, remaining_amount, assigned, listing):
     """Get all contracts
 
     Args:
@@ -56,9 +76,15 @@ def get_contracts(token, status, remaining_amount, assigned):
         to the current user.
                                     Defaults to False.
                                     This is enabled by using the --assigned flag.
+        listing (ListingOptions): The page to return and how to fetch it, set
+                                  by the --limit, --after, --sort,
+                                  --stream, --format and --fields options.
     """
-    with Session(engine) as session:
-        select_stmt = select(Contract)
+    with Session(get_engine()) as session:
+        # printing a contract reads its client and sales contact
+        select_stmt = listing.select(
+            Contract, joinedload(Contract.client), joinedload(Contract.collaborator)
+        )
         if status:
             select_stmt = select_stmt.where(Contract.status == Status(status))
         if remaining_amount:
@@ -72,19 +98,16 @@ def get_contracts(token, status, remaining_amount, assigned):
             select_stmt = select_stmt.where(
                 Contract.sales_contact_id == collaborator_id
             )
-        contracts = session.execute(select_stmt).scalars().all()
-        if not contracts:
-            view.display_message("No contracts found.")
-        for contract in contracts:
-            view.display_message(contract)
+        select_stmt = listing.apply(select_stmt, Contract.id)
+        listing.display(listing.fetch(session, select_stmt), "No contracts found.")
 
 
-@cli.command()
+@click.command()
 @permission(ActionType.CREATE, resource=ResourceType.CONTRACT)
 @login_required()
 def create_contract():
     """Create a new contract"""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         client_id = util.ask_for_input("Client ID", validator.validate_digit)
         client = session.get(Client, client_id)
         if not client:
@@ -102,35 +125,80 @@ def create_contract():
             view.display_error("This collaborator cannot be assigned to a contract.")
             return
 
-        total_amount = util.ask_for_input("Total amount ", validator.validate_decimal)
-        remaining_amount = util.ask_for_input(
-            "Remaining amount ", validator.validate_decimal
-        )
-        status = util.choose_from_enum(Status)
-        contract = Contract(
-            total_amount, remaining_amount, status, client_id, sales_contact_id
-        )
+    # no transaction is held while the rest is asked
+    total_amount = util.ask_for_input("Total amount ", validator.validate_decimal)
+    remaining_amount = util.ask_for_input(
+        "Remaining amount ", validator.validate_decimal
+    )
+    status = util.choose_from_enum(Status)
+    contract = Contract(
+        total_amount, remaining_amount, status, client_id, sales_contact_id
+    )
 
+    with Session(get_engine()) as session:
         session.add(contract)
         session.commit()
 
 
-@cli.command()
+@click.command()
+@click.option("--id", "contract_id", type=int, help="Update the contract of this id.")
+@click.option(
+    "--where-status",
+    type=click.Choice(STATUSES),
+    callback=update.parsed_by(parse_status),
+    help="Update the contracts with this status.",
+)
+@click.option(
+    "--where-client-id", type=int, help="Update the contracts of this client."
+)
+@click.option(
+    "--total-amount",
+    callback=update.parsed_by(validator.parse_decimal),
+    help="New total amount.",
+)
+@click.option(
+    "--remaining-amount",
+    callback=update.parsed_by(validator.parse_decimal),
+    help="New remaining amount.",
+)
+@click.option(
+    "--status",
+    type=click.Choice(STATUSES),
+    callback=update.parsed_by(parse_status),
+    help="New status.",
+)
+@click.option("--client-id", type=int, help="New client.")
+@click.option("--sales-contact-id", type=int, help="New sales contact.")
 @permission(
     ActionType.UPDATE_ALL, ActionType.UPDATE_MINE, resource=ResourceType.CONTRACT
 )
 @login_required(pass_token=True)
-def update_contract(token):
-    """Update a contract"""
-    with Session(engine) as session:
+def update_contract(token, contract_id, where_status, where_client_id, **values):
+    """Update a contract
+
+    Without options, the contract is chosen and edited interactively. With
+    the --id or --where-* options, the new values given as options are set on
+    all the selected contracts at once.
+    """
+    selection = update.given(
+        id=contract_id, status=where_status, client_id=where_client_id
+    )
+    values = update.given(**values)
+    if selection or values:
+        update_contracts(token, selection, values)
+        return
+
+    # The contract is edited while no connection nor transaction is held, then
+    # saved at the end unless someone else changed it meanwhile.
+    with Session(get_engine()) as session:
         contract_id = util.ask_for_input("Contract ID", validator.validate_digit)
         contract = session.get(Contract, contract_id)
         if not contract:
             view.display_error(f"Contract with id {contract_id} does not exist.")
             return
 
-        is_manager = PermissionManager.has_permission(
-            RoleType(token["role"]), ActionType.UPDATE_ALL, resource=ResourceType.EVENT
+        is_manager = get_auth_context().has_permission(
+            ActionType.UPDATE_ALL, ResourceType.EVENT
         )
 
         if not is_manager:
@@ -140,40 +208,130 @@ def update_contract(token):
                     "assigned."
                 )
                 return
-
         view.display_message(f"Updating\n{contract}", "blue")
-        while True:
-            choice = int(view.display_edit_contract())
-            if 0 <= choice <= 6:
-                if choice == 0:
-                    break
-                elif choice == 1:
-                    contract.total_amount = util.ask_for_input(
-                        "Total amount ", validator.validate_decimal
-                    )
-                elif choice == 2:
-                    contract.remaining_amount = util.ask_for_input(
-                        "Remaining amount ", validator.validate_decimal
-                    )
-                elif choice == 3:
-                    contract.status = util.choose_from_enum(Status)
-                elif choice == 4:
-                    client_id = util.ask_for_input(
-                        "Client ID ", validator.validate_digit
-                    )
-                    if session.get(Client, client_id):
-                        contract.client_id = client_id
-                # do the client need to be changed too ?
-                elif choice == 5:
-                    sales_id = util.ask_for_input(
-                        "Sales contact ID ", validator.validate_digit
-                    )
+
+    while True:
+        choice = int(view.display_edit_contract())
+        if 0 <= choice <= 6:
+            if choice == 0:
+                break
+            elif choice == 1:
+                contract.total_amount = util.ask_for_input(
+                    "Total amount ", validator.validate_decimal
+                )
+            elif choice == 2:
+                contract.remaining_amount = util.ask_for_input(
+                    "Remaining amount ", validator.validate_decimal
+                )
+            elif choice == 3:
+                contract.status = util.choose_from_enum(Status)
+            elif choice == 4:
+                client_id = util.ask_for_input("Client ID ", validator.validate_digit)
+                with Session(get_engine()) as session:
+                    client = session.get(Client, client_id)
+                if client:
+                    contract.client_id = client_id
+            # do the client need to be changed too ?
+            elif choice == 5:
+                sales_id = util.ask_for_input(
+                    "Sales contact ID ", validator.validate_digit
+                )
+                with Session(get_engine()) as session:
                     collaborator = session.get(Collaborator, sales_id)
-                    if collaborator and collaborator.role.name == RoleType.SALES:
-                        contract.sales_contact_id = sales_id
-                    else:
-                        view.display_error("Sales contact id does not exist.")
-            else:
-                view.display_error("Invalid choice.")
+                if collaborator and collaborator.role.name == RoleType.SALES:
+                    contract.sales_contact_id = sales_id
+                else:
+                    view.display_error("Sales contact id does not exist.")
+        else:
+            view.display_error("Invalid choice.")
+
+    with Session(get_engine()) as session:
+        if update.commit_edits(session, contract):
+            view.display_message(f"{contract} has been updated.", "green")
+
+
+def update_contracts(token, selection, values):
+    """Set the values on the selected contracts with a single UPDATE, the
+    contracts of another sales contact being left out for non managers."""
+    if not update.check_options(values, selection, "contracts"):
+        return
+    where = update.matching(Contract, selection)
+    if not get_auth_context().has_permission(
+        ActionType.UPDATE_ALL, ResourceType.CONTRACT
+    ):
+        where.append(Contract.sales_contact_id == token["id"])
+    unmatched = "none matches the selection"
+    if "sales_contact_id" in values:
+        where.append(update.has_role(values["sales_contact_id"], RoleType.SALES))
+        unmatched += " or the new sales contact is not a sales collaborator"
+    with Session(get_engine()) as session:
+        count = update.update_rows(session, Contract, values, where)
+    update.display_updated(count, "contracts", unmatched)
+
+
+def check_contracts(session, batch, rejects):
+    """Return the contracts of the batch to load, their clients and sales
+    contacts being read with one query for the whole batch."""
+    client_ids = {values["client_id"] for _, values in batch}
+    clients = {
+        client.id: client
+        for client in session.execute(
+            select(Client.id, Client.sales_contact_id, Collaborator.role)
+            .outerjoin(Collaborator, Client.sales_contact_id == Collaborator.id)
+            .where(Client.id.in_(client_ids))
+        )
+    }
+    contracts = []
+    for line, values in batch:
+        client_id = values["client_id"]
+        client = clients.get(client_id)
+        if client is None:
+            error = f"Client with id {client_id} does not exist."
+        elif client.role != RoleType.SALES:
+            error = "This collaborator cannot be assigned to a contract."
+        else:
+            contracts.append(
+                (
+                    client_id,
+                    values["total_amount"],
+                    values["remaining_amount"],
+                    values["status"].name,
+                    client.sales_contact_id,
+                )
+            )
+            continue
+        rejects.write(line, [error], values)
+    return contracts
+
+
+@click.command()
+@bulk.import_options
+@permission(ActionType.CREATE, resource=ResourceType.CONTRACT)
+@login_required()
+def import_contracts(file, file_format, rejects_path):
+    """Import contracts from a CSV or NDJSON file
+
+    Args:
+        file (str): The file to import, with client_id, total_amount,
+                    remaining_amount and status columns. The sales contact of
+                    a contract is the one of its client.
+        file_format (str, optional): csv or ndjson. This is enabled by using
+                                     the --format option.
+        rejects_path (str, optional): Where to write the rejected rows. This
+                                      is enabled by using the --rejects option.
+    """
+    with bulk.failing_import(), Session(get_engine()) as session, bulk.RejectWriter(
+        rejects_path, IMPORT_FIELDS
+    ) as rejects:
+        rows = bulk.valid_rows(
+            bulk.read_rows(file, file_format), IMPORT_FIELDS, IMPORT_PARSERS, rejects
+        )
+        loaded = bulk.load(
+            session,
+            rows,
+            lambda batch: check_contracts(session, batch, rejects),
+            "contract",
+            IMPORT_COLUMNS,
+        )
         session.commit()
-        view.display_message(f"{contract} has been updated.", "green")
+    bulk.display_summary(loaded, "contracts", rejects)
@@ -1,15 +1,17 @@
+import datetime
+
 import click
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, joinedload
 
 import validator
-from cli import cli
-from db_config import engine
+from db_config import get_engine
 from models.collaborator import Collaborator
 from models.contract import Contract, Status
 from models.event import Event
-from utils import util
-from utils.permissions import PermissionManager
+from utils import bulk, update, util
+from utils.listing import listing_options
+from utils.permissions import get_auth_context
 from utils.permissions import (
     login_required,
     permission,
@@ -19,17 +21,87 @@ from utils.permissions import (
 )
 from views import view
 
+MOMENT_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+IMPORT_PARSERS = bulk.column_parsers(
+    Event,
+    {
+        "contract_id": validator.parse_digit,
+        "start_date": validator.parse_date,
+        "start_time": validator.parse_time,
+        "end_date": validator.parse_date,
+        "end_time": validator.parse_time,
+        "location": None,
+        "attendees": validator.parse_digit,
+        "support_contact_id": validator.optional(validator.parse_digit),
+    },
+)
+IMPORT_FIELDS = (*IMPORT_PARSERS, "note")
+
+
+def parse_moment(ctx, param, value):
+    """Parse a --from or --to date, with an optional time. A --to date without
+    time includes the whole day."""
+    if value is None:
+        return None
+    for moment_format in MOMENT_FORMATS:
+        try:
+            moment = datetime.datetime.strptime(value, moment_format)
+        except ValueError:
+            continue
+        if moment_format == "%Y-%m-%d" and param.name == "to":
+            moment = datetime.datetime.combine(moment.date(), datetime.time.max)
+        return moment
+    raise click.BadParameter("Your date must be yyyy-mm-dd or yyyy-mm-dd HH:MM.")
+
+
+def starts_after(moment):
+    """Events starting at or after the moment: a range on start_date, which
+    indexes can serve, refined on start_time for the first day."""
+    day, time = moment.date(), moment.time()
+    return and_(
+        Event.start_date >= day,
+        or_(Event.start_date > day, Event.start_time >= time),
+    )
+
+
+def starts_before(moment):
+    """Events starting at or before the moment."""
+    day, time = moment.date(), moment.time()
+    return and_(
+        Event.start_date <= day,
+        or_(Event.start_date < day, Event.start_time <= time),
+    )
+
 
-@cli.command()
+@click.command()
 @click.option(
     "--assign",
     type=click.Choice(["all", "assigned", "no-contact"]),
     default="all",
     help="Return all the events with or without filter",
 )
+@click.option(
+    "--from",
+    "start",
+    callback=parse_moment,
+    help="Only return events starting from this date (yyyy-mm-dd [HH:MM]).",
+)
+@click.option(
+    "--to",
+    callback=parse_moment,
+    help="Only return events starting until this date (yyyy-mm-dd [HH:MM]).",
+)
+@click.option(
+    "--upcoming",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Only return events starting in the next N days.",
+)
+@listing_options(Event, stream=True)
 @permission(ActionType.READ, resource=ResourceType.EVENT)
 @login_required(pass_token=True)
-def get_events(token, assign):
+def get_events(token, assign, start, to, upcoming, listing):
     """Get all events
 
     Args:
@@ -37,12 +109,29 @@ def get_events(token, assign):
         assign (str, optional): Filter events based on assignment.
             - "all": Returns all events.
             - "assigned": Returns events assigned to the current user.
-            - "no-contact": Returns events without a support contact.
+            - "no-contact": Returns events without a support contact,
+                            ordered by start date.
             Defaults to "all".
             This is enabled by using the --assign flag.
+        start (datetime, optional): Only return events starting from this
+                                    moment. This is enabled by using the
+                                    --from option.
+        to (datetime, optional): Only return events starting until this
+                                 moment. This is enabled by using the --to
+                                 option.
+        upcoming (int, optional): Only return events starting between now and
+                                  this number of days. This is enabled by
+                                  using the --upcoming option.
+        Events filtered by date are ordered by start date.
+        listing (ListingOptions): The page to return and how to fetch it, set
+                                  by the --limit, --after, --sort,
+                                  --stream, --format and --fields options.
+                                  Events are streamed unless --buffered
+                                  is used.
     """
-    with Session(engine) as session:
-        stmt = select(Event)
+    with Session(get_engine()) as session:
+        # printing an event reads its support contact
+        stmt = listing.select(Event, joinedload(Event.collaborator))
         try:
             collaborator_id = token["id"]
         except KeyError:
@@ -50,23 +139,35 @@ def get_events(token, assign):
                 "No id stocked in the current token. Try to login again."
             )
             return
+        if upcoming is not None:
+            if start or to:
+                view.display_error("--upcoming can't be used with --from or --to.")
+                return
+            start = datetime.datetime.now()
+            to = start + datetime.timedelta(days=upcoming)
+        order = None
+        if start or to:
+            order = Event.start_date
+        if start:
+            stmt = stmt.where(starts_after(start))
+        if to:
+            stmt = stmt.where(starts_before(to))
         if assign == "assigned":
             stmt = stmt.where(Event.support_contact_id == collaborator_id)
         elif assign == "no-contact":
-            stmt = stmt.where(Event.support_contact_id is None)
-        all_events = session.execute(stmt).scalars().all()
-        if not all_events:
-            view.display_message("No events found.")
-        for event in all_events:
-            view.display_message(event)
+            # the events left to assign, soonest first
+            stmt = stmt.where(Event.support_contact_id.is_(None))
+            order = Event.start_date
+        stmt = listing.apply(stmt, Event.id, order)
+        listing.display(listing.fetch(session, stmt), "No events found.")
 
 
-@cli.command()
+@click.command()
 @permission(ActionType.CREATE, resource=ResourceType.EVENT)
 @login_required(pass_token=True)
 def create_event(token):
     """Create a new event"""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         contract_id = util.ask_for_input("Contract ID", validator.validate_digit)
         contract = session.get(Contract, contract_id)
         if not contract:
@@ -88,19 +189,20 @@ def create_event(token):
             view.display_error("The contract must be signed in order to create events.")
             return
 
-        start_date = util.ask_for_input(
-            "Start date (yyyy-mm-dd)", validator.validate_date
-        )
-        start_time = util.ask_for_input("Start time (HH:MM)", validator.validate_time)
+    # no transaction is held while the event is asked
+    start_date = util.ask_for_input("Start date (yyyy-mm-dd)", validator.validate_date)
+    start_time = util.ask_for_input("Start time (HH:MM)", validator.validate_time)
+
+    end_date = util.ask_for_input("End date (yyyy-mm-dd)", validator.validate_date)
+    end_time = util.ask_for_input("End time (HH:MM)", validator.validate_time)
 
-        end_date = util.ask_for_input("End date (yyyy-mm-dd)", validator.validate_date)
-        end_time = util.ask_for_input("End time (HH:MM)", validator.validate_time)
+    location = util.ask_for_input("Location")
+    attendees = util.ask_for_input("Attendees", validator.validate_digit)
+    support_id = util.ask_for_input("Support ID (optional)")
+    if not support_id.isdigit():
+        support_id = None
 
-        location = util.ask_for_input("Location")
-        attendees = util.ask_for_input("Attendees", validator.validate_digit)
-        support_id = util.ask_for_input("Support ID (optional)")
-        if not support_id.isdigit():
-            support_id = None
+    with Session(get_engine()) as session:
         if support_id:
             collaborator = session.get(Collaborator, support_id)
             if not collaborator:
@@ -125,19 +227,81 @@ def create_event(token):
         session.commit()
 
 
-@cli.command()
+@click.command()
+@click.option("--id", "event_id", type=int, help="Update the event of this id.")
+@click.option(
+    "--where-contract-id", type=int, help="Update the events of this contract."
+)
+@click.option(
+    "--where-support-contact-id",
+    type=int,
+    help="Update the events of this support contact.",
+)
+@click.option(
+    "--start-date",
+    callback=update.parsed_by(validator.parse_date),
+    help="New start date, yyyy-mm-dd.",
+)
+@click.option(
+    "--start-time",
+    callback=update.parsed_by(validator.parse_time),
+    help="New start time, HH:MM.",
+)
+@click.option(
+    "--end-date",
+    callback=update.parsed_by(validator.parse_date),
+    help="New end date, yyyy-mm-dd.",
+)
+@click.option(
+    "--end-time",
+    callback=update.parsed_by(validator.parse_time),
+    help="New end time, HH:MM.",
+)
+@click.option("--location", help="New location.")
+@click.option(
+    "--attendees",
+    callback=update.parsed_by(validator.parse_digit),
+    help="New number of attendees.",
+)
+@click.option("--contract-id", type=int, help="New contract, for managers.")
+@click.option(
+    "--support-contact-id", type=int, help="New support contact, for managers."
+)
 @permission(ActionType.UPDATE_ALL, ActionType.UPDATE_MINE, resource=ResourceType.EVENT)
 @login_required(pass_token=True)
-def update_event(token):
-    """Update an event"""
-    with Session(engine) as session:
+def update_event(
+    token,
+    event_id,
+    where_contract_id,
+    where_support_contact_id,
+    **values,
+):
+    """Update an event
+
+    Without options, the event is chosen and edited interactively. With the
+    --id or --where-* options, the new values given as options are set on all
+    the selected events at once.
+    """
+    selection = update.given(
+        id=event_id,
+        contract_id=where_contract_id,
+        support_contact_id=where_support_contact_id,
+    )
+    values = update.given(**values)
+    if selection or values:
+        update_events(token, selection, values)
+        return
+
+    # The event is edited while no connection nor transaction is held, then
+    # saved at the end unless someone else changed it meanwhile.
+    with Session(get_engine()) as session:
         event_id = util.ask_for_input("Event ID", validator.validate_digit)
         event = session.get(Event, event_id)
         if not event:
             view.display_error(f"Event with id {event_id} does not exist.")
             return
-        is_manager = PermissionManager.has_permission(
-            RoleType(token["role"]), ActionType.UPDATE_ALL, resource=ResourceType.EVENT
+        is_manager = get_auth_context().has_permission(
+            ActionType.UPDATE_ALL, ResourceType.EVENT
         )
         if not is_manager:
             if event.support_contact_id != token["id"]:
@@ -148,53 +312,199 @@ def update_event(token):
                 return
         max_choice = 8 if is_manager else 6
         view.display_message(f"Updating\n{event}", "blue")
-        while True:
-            choice = int(view.display_edit_event(is_manager))
-            if 0 <= choice <= max_choice:
-                if choice == 0:
-                    break
-                elif choice == 1:
-                    event.start_date = util.ask_for_input(
-                        "Start date", validator.validate_date
-                    )
-                elif choice == 2:
-                    event.start_time = util.ask_for_input(
-                        "Start time", validator.validate_time
-                    )
-                elif choice == 3:
-                    event.end_date = util.ask_for_input(
-                        "End date", validator.validate_date
-                    )
-                elif choice == 4:
-                    event.end_time = util.ask_for_input(
-                        "End time", validator.validate_date
-                    )
-                elif choice == 5:
-                    event.location = util.ask_for_input("Location")
-                elif choice == 6:
-                    event.attendees = util.ask_for_input(
-                        "Attendees", validator.validate_digit
-                    )
-                elif choice == 7:
-                    contract_id = util.ask_for_input(
-                        "Contract ID ", validator.validate_digit
-                    )
-                    if session.get(Contract, contract_id):
-                        event.contract_id = contract_id
-                    else:
-                        view.display_error(
-                            f"Contract with id {contract_id} does not exist."
-                        )
-                elif choice == 8:
-                    collaborator_id = util.ask_for_input(
-                        "Support ID ", validator.validate_digit
+
+    while True:
+        choice = int(view.display_edit_event(is_manager))
+        if 0 <= choice <= max_choice:
+            if choice == 0:
+                break
+            elif choice == 1:
+                event.start_date = util.ask_for_input(
+                    "Start date", validator.validate_date
+                )
+            elif choice == 2:
+                event.start_time = util.ask_for_input(
+                    "Start time", validator.validate_time
+                )
+            elif choice == 3:
+                event.end_date = util.ask_for_input("End date", validator.validate_date)
+            elif choice == 4:
+                event.end_time = util.ask_for_input("End time", validator.validate_date)
+            elif choice == 5:
+                event.location = util.ask_for_input("Location")
+            elif choice == 6:
+                event.attendees = util.ask_for_input(
+                    "Attendees", validator.validate_digit
+                )
+            elif choice == 7:
+                contract_id = util.ask_for_input(
+                    "Contract ID ", validator.validate_digit
+                )
+                with Session(get_engine()) as session:
+                    contract = session.get(Contract, contract_id)
+                if contract:
+                    event.contract_id = contract_id
+                else:
+                    view.display_error(
+                        f"Contract with id {contract_id} does not exist."
                     )
+            elif choice == 8:
+                collaborator_id = util.ask_for_input(
+                    "Support ID ", validator.validate_digit
+                )
+                with Session(get_engine()) as session:
                     collaborator = session.get(Collaborator, collaborator_id)
-                    if collaborator and collaborator.role == RoleType.SUPPORT:
-                        event.support_contact_id = collaborator_id
-                    else:
-                        view.display_error("Support contact id does not exist.")
-            else:
-                view.display_error("Invalid choice.")
+                if collaborator and collaborator.role == RoleType.SUPPORT:
+                    event.support_contact_id = collaborator_id
+                else:
+                    view.display_error("Support contact id does not exist.")
+        else:
+            view.display_error("Invalid choice.")
+
+    with Session(get_engine()) as session:
+        if update.commit_edits(session, event):
+            view.display_message(f"{event} has been updated.", "green")
+
+
+@click.command()
+@permission(ActionType.UPDATE_MINE, resource=ResourceType.EVENT)
+@login_required(pass_token=True)
+def claim_event(token):
+    """Assign the next upcoming event without support contact to yourself
+
+    The event is locked with FOR UPDATE SKIP LOCKED: events being claimed by
+    other collaborators are skipped instead of waited for.
+    """
+    with Session(get_engine()) as session:
+        try:
+            token_id = token["id"]
+        except KeyError:
+            view.display_error("No id stocked in the current token. Try to log again.")
+            return
+        event = session.scalars(
+            select(Event)
+            .where(
+                Event.support_contact_id.is_(None),
+                Event.start_date >= datetime.date.today(),
+            )
+            .order_by(Event.start_date, Event.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if not event:
+            view.display_message("No event left to assign.")
+            return
+        event.support_contact_id = token_id
+        session.commit()
+        view.display_message(f"{event} has been assigned to you.", "green")
+
+
+def update_events(token, selection, values):
+    """Set the values on the selected events with a single UPDATE. Non
+    managers only update their own events, and can't change their contract or
+    support contact."""
+    if not update.check_options(values, selection, "events"):
+        return
+    where = update.matching(Event, selection)
+    if not get_auth_context().has_permission(ActionType.UPDATE_ALL, ResourceType.EVENT):
+        if values.keys() & {"contract_id", "support_contact_id"}:
+            view.display_error(
+                "Only managers can change the contract or the support contact of "
+                "an event."
+            )
+            return
+        where.append(Event.support_contact_id == token["id"])
+    unmatched = "none matches the selection"
+    if "support_contact_id" in values:
+        where.append(update.has_role(values["support_contact_id"], RoleType.SUPPORT))
+        unmatched += " or the new support contact is not a support collaborator"
+    with Session(get_engine()) as session:
+        count = update.update_rows(session, Event, values, where)
+    update.display_updated(count, "events", unmatched)
+
+
+def check_events(session, token_id, batch, rejects):
+    """Return the events of the batch to load, their contracts and support
+    contacts being read with one query each for the whole batch."""
+    contract_ids = {values["contract_id"] for _, values in batch}
+    contracts = {
+        contract.id: contract
+        for contract in session.execute(
+            select(Contract.id, Contract.status, Contract.sales_contact_id).where(
+                Contract.id.in_(contract_ids)
+            )
+        )
+    }
+    support_ids = {values["support_contact_id"] for _, values in batch} - {None}
+    roles = dict(
+        session.execute(
+            select(Collaborator.id, Collaborator.role).where(
+                Collaborator.id.in_(support_ids)
+            )
+        ).all()
+    )
+    events = []
+    for line, values in batch:
+        contract_id = values["contract_id"]
+        contract = contracts.get(contract_id)
+        support_id = values["support_contact_id"]
+        if contract is None:
+            error = f"Contract with id {contract_id} does not exist."
+        elif contract.sales_contact_id != token_id:
+            error = "You are not authorized to create events for this contract."
+        elif contract.status != Status.SIGNED:
+            error = "The contract must be signed in order to create events."
+        elif support_id is not None and support_id not in roles:
+            error = f"Collaborator with id {support_id} does not exist."
+        elif support_id is not None and roles[support_id] != RoleType.SUPPORT:
+            error = "This collaborator cannot be assigned to a event."
+        else:
+            events.append(
+                (
+                    *(values[field] for field in IMPORT_PARSERS),
+                    values["note"] or "",
+                )
+            )
+            continue
+        rejects.write(line, [error], values)
+    return events
+
+
+@click.command()
+@bulk.import_options
+@permission(ActionType.CREATE, resource=ResourceType.EVENT)
+@login_required(pass_token=True)
+def import_events(token, file, file_format, rejects_path):
+    """Import events from a CSV or NDJSON file
+
+    Args:
+        token (str): The token of the current user, who must be the sales
+                     contact of the contracts of the events.
+        file (str): The file to import, with contract_id, start_date,
+                    start_time, end_date, end_time, location, attendees and
+                    optional support_contact_id and note columns.
+        file_format (str, optional): csv or ndjson. This is enabled by using
+                                     the --format option.
+        rejects_path (str, optional): Where to write the rejected rows. This
+                                      is enabled by using the --rejects option.
+    """
+    try:
+        token_id = token["id"]
+    except KeyError:
+        view.display_error("No id stocked in the current token. Try to log again.")
+        return
+    with bulk.failing_import(), Session(get_engine()) as session, bulk.RejectWriter(
+        rejects_path, IMPORT_FIELDS
+    ) as rejects:
+        rows = bulk.valid_rows(
+            bulk.read_rows(file, file_format), IMPORT_FIELDS, IMPORT_PARSERS, rejects
+        )
+        loaded = bulk.load(
+            session,
+            rows,
+            lambda batch: check_events(session, token_id, batch, rejects),
+            "event",
+            IMPORT_FIELDS,
+        )
         session.commit()
-        view.display_message(f"{event} has been updated.", "green")
+    bulk.display_summary(loaded, "events", rejects)
@@ -0,0 +1,148 @@
+import contextlib
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+
+import click
+import sentry_sdk
+
+from daemon_client import (
+    EXIT,
+    EXIT_STATUS,
+    STDERR,
+    STDOUT,
+    connect,
+    runs_locally,
+    send_frame,
+    socket_path,
+)
+from shell import warm_up
+from views import view
+
+
+class FrameWriter(io.RawIOBase):
+    """Binary stream sending what is written to it as frames of one kind."""
+
+    def __init__(self, wfile, kind):
+        super().__init__()
+        self.wfile = wfile
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        send_frame(self.wfile, self.kind, bytes(data))
+        return len(data)
+
+
+def exit_status(code):
+    if code is None:
+        return 0
+    return code if isinstance(code, int) else 1
+
+
+def run_command(group, args, stdin, stdout, stderr, color=None):
+    """Run a command of the group with the given standard streams and return
+    its exit status."""
+    previous_stdin = sys.stdin
+    sys.stdin = stdin
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                group.main(args, prog_name="epicevent", color=color)
+            except SystemExit as e:
+                return exit_status(e.code)
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+                view.display_error(str(e))
+                return 1
+            finally:
+                stdout.flush()
+                stderr.flush()
+    finally:
+        sys.stdin = previous_stdin
+    return 0
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        stdin = io.TextIOWrapper(self.rfile, encoding="utf-8")
+        stdout = io.TextIOWrapper(
+            io.BufferedWriter(FrameWriter(self.wfile, STDOUT)), encoding="utf-8"
+        )
+        stderr = io.TextIOWrapper(
+            io.BufferedWriter(FrameWriter(self.wfile, STDERR)), encoding="utf-8"
+        )
+        try:
+            if runs_locally(request["argv"]):
+                # forwarded anyway, its prompts would wait for answers the
+                # daemon can't read from the terminal of the user
+                stderr.write("This command prompts, run it without the daemon.\n")
+                stderr.flush()
+                status = 2
+            else:
+                status = run_command(
+                    self.server.group,
+                    request["argv"],
+                    stdin,
+                    stdout,
+                    stderr,
+                    request.get("color"),
+                )
+            send_frame(self.wfile, EXIT, EXIT_STATUS.pack(status))
+        except BrokenPipeError:
+            pass
+        finally:
+            # the socket files are closed by the handler, not by the wrappers
+            for stream in (stdin, stdout, stderr):
+                stream.detach()
+
+
+class CommandServer(socketserver.UnixStreamServer):
+    """Serves one command at a time: commands use sys.stdin and sys.stdout,
+    which can't be swapped per thread."""
+
+    def __init__(self, path, group):
+        super().__init__(path, CommandHandler)
+        self.group = group
+
+
+@click.command()
+@click.pass_context
+def serve(ctx):
+    """Run a daemon serving the commands over a local socket.
+
+    The daemon keeps the database connection pool and the controllers loaded,
+    the `epicevent` executable forwards its commands to it while it runs.
+    """
+    path = socket_path()
+    running = connect()
+    if running is not None:
+        running.close()
+        view.display_error(f"A daemon is already listening on {path}.")
+        return
+    # left behind by a daemon which didn't stop cleanly
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+    group = ctx.find_root().command
+    warm_up(group, ctx)
+    previous_umask = os.umask(0o177)
+    try:
+        server = CommandServer(path, group)
+    finally:
+        os.umask(previous_umask)
+    view.display_message(f"Listening on {path}. Press Ctrl+C to stop.", "green")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
@@ -0,0 +1,173 @@
+"""Entry point of the `epicevent` executable.
+
+When a daemon started with `epicevent serve` listens for the current
+directory, the command line and stdin are forwarded to it and its output is
+written back, so the command runs without importing the application. The
+command runs in-process otherwise.
+
+Only the standard library is imported here, to keep the forwarding path cheap.
+"""
+
+import hashlib
+import json
+import os
+import selectors
+import socket
+import struct
+import sys
+import tempfile
+
+# commands touching the local configuration or starting a long-lived process
+LOCAL_COMMANDS = ("init", "login", "logout", "serve", "shell")
+# Commands prompting the user, which run locally too: the daemon has no
+# terminal to read passwords from, and serves one command at a time, so a user
+# answering prompts would hold it for everyone.
+PROMPTING_COMMANDS = (
+    "create-client",
+    "create-collaborator",
+    "create-contract",
+    "create-event",
+    "delete-collaborator",
+)
+# commands prompting only when run without options
+EDITING_COMMANDS = (
+    "update-client",
+    "update-collaborator",
+    "update-contract",
+    "update-event",
+)
+
+# Daemon to client frames: kind (1 byte) and payload size (4 bytes).
+FRAME_HEADER = struct.Struct("!cI")
+EXIT_STATUS = struct.Struct("!i")
+STDOUT = b"o"
+STDERR = b"e"
+EXIT = b"x"
+
+
+def socket_path():
+    """Path of the daemon socket, one per user and working directory since the
+    daemon serves the configuration of the directory it was started from."""
+    path = os.getenv("EPICEVENT_SOCKET")
+    if path:
+        return path
+    digest = hashlib.sha1(os.getcwd().encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"epicevent-{os.getuid()}-{digest}.sock")
+
+
+def runs_locally(argv):
+    """Whether the command line must run in-process instead of on the daemon."""
+    command = next((arg for arg in argv if not arg.startswith("-")), None)
+    if command in EDITING_COMMANDS:
+        return argv == [command]
+    return command in LOCAL_COMMANDS or command in PROMPTING_COMMANDS
+
+
+def send_frame(wfile, kind, payload):
+    wfile.write(FRAME_HEADER.pack(kind, len(payload)) + payload)
+    wfile.flush()
+
+
+def connect():
+    """Connect to the daemon, return None if it isn't running."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def get_stdin_fd():
+    try:
+        return sys.stdin.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def send_stdin(sock, data):
+    """Send stdin to the daemon, return False once it stopped reading it."""
+    try:
+        sock.sendall(data)
+    except (BrokenPipeError, ConnectionResetError):
+        return False
+    return True
+
+
+def close_stdin(sock):
+    try:
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def forward(sock, argv):
+    """Run a command on the daemon and return its exit status.
+
+    The daemon reads stdin as a plain stream, ended when the client shuts down
+    its side of the socket. It answers with stdout, stderr and exit frames.
+    """
+    stdout, stderr = sys.stdout.buffer, sys.stderr.buffer
+    request = {"argv": argv, "color": sys.stdout.isatty()}
+    sock.sendall(json.dumps(request).encode() + b"\n")
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    stdin_fd = get_stdin_fd()
+    try:
+        if stdin_fd is not None:
+            selector.register(stdin_fd, selectors.EVENT_READ)
+    except (OSError, ValueError):
+        # regular files can't be polled, they are sent at once
+        send_stdin(sock, os.fdopen(stdin_fd, "rb", closefd=False).read())
+        stdin_fd = None
+    if stdin_fd is None:
+        close_stdin(sock)
+
+    buffer = b""
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is not sock:
+                data = os.read(stdin_fd, 65536)
+                if not data or not send_stdin(sock, data):
+                    selector.unregister(stdin_fd)
+                    close_stdin(sock)
+                continue
+
+            data = sock.recv(65536)
+            if not data:
+                stderr.write(b"Connection to the daemon lost.\n")
+                stderr.flush()
+                return 1
+            buffer += data
+            while len(buffer) >= FRAME_HEADER.size:
+                kind, size = FRAME_HEADER.unpack_from(buffer)
+                end = FRAME_HEADER.size + size
+                if len(buffer) < end:
+                    break
+                payload, buffer = buffer[FRAME_HEADER.size : end], buffer[end:]
+                if kind == EXIT:
+                    return EXIT_STATUS.unpack(payload)[0]
+                stream = stdout if kind == STDOUT else stderr
+                stream.write(payload)
+                stream.flush()
+
+
+def main():
+    argv = sys.argv[1:]
+    if not runs_locally(argv):
+        sock = connect()
+        if sock is not None:
+            with sock:
+                sys.exit(forward(sock, argv))
+
+    from cli import cli
+
+    cli()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,30 @@
+import os
 import secrets
+import time
 
+import click
 import psycopg2
 import sentry_sdk
-from sqlalchemy import select
+from argon2 import PasswordHasher
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
 
 import views.view
-from cli import cli
-from db_config import DB_NAME, engine, DB_USER, DB_PASSWORD, DB_PORT
+from db_config import DB_NAME, DB_HOST, DB_USER, DB_PASSWORD, DB_PORT, get_engine
 from models import Base
 from models.collaborator import Collaborator
 from utils.permissions import RoleType
-from utils.util import write_env_variable
+from utils.util import get_password_hasher, write_env_variable
 
+# The weakest of the argon2id parameters recommended by OWASP: 19 MiB, 2 passes.
+MIN_MEMORY_COST = 19 * 1024
+MIN_TIME_COST = 2
 
-@cli.command()
+# indexes of previous versions, replaced by others of the models
+REPLACED_INDEXES = ("ix_client_search_trgm",)
+
+
+@click.command()
 def init():
     """
     Generate secret key for JWT Token
@@ -36,13 +46,43 @@ def init():
     init_db()
 
 
+def drop_replaced_indexes(bind):
+    """Drop the indexes replaced by others, which would still be maintained on
+    every write."""
+    with bind.begin() as conn:
+        for name in REPLACED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def create_indexes(bind):
+    """Create the declared indexes missing from the database: create_all only
+    creates them along with their table, not on tables created before them."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+
+
+def add_version_columns(bind):
+    """Add the version column of the models to the tables created before it,
+    the existing rows starting at the first version."""
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if "version_id" in table.c:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS "
+                        f"version_id INTEGER NOT NULL DEFAULT 1"
+                    )
+                )
+
+
 def init_db():
     try:
         conn = psycopg2.connect(
             dbname="postgres",
             user=DB_USER,
             password=DB_PASSWORD,
-            host="localhost",
+            host=DB_HOST,
             port=DB_PORT,
         )
         conn.autocommit = True
@@ -62,7 +102,11 @@ def init_db():
         conn.close()
 
         try:
+            engine = get_engine()
             Base.metadata.create_all(engine)
+            add_version_columns(engine)
+            drop_replaced_indexes(engine)
+            create_indexes(engine)
 
             views.view.display_message(
                 f"The tables have been successfully created in the database "
@@ -96,5 +140,103 @@ def init_db():
         views.view.display_error(e)
 
 
+def time_hash(hasher, samples=3):
+    """Duration of a hash in seconds, the fastest of a few ones so that a
+    busy moment of the machine doesn't count."""
+    durations = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash("calibration password")
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def calibrate_hasher(target, memory_cost, parallelism):
+    """The most costly hasher whose hash doesn't take longer than the target
+    duration, in seconds, on this machine, and the duration of its hash.
+
+    The memory is halved while the fewest passes are still too slow, down to
+    MIN_MEMORY_COST. A pass taking about the same time as the others, the
+    number of passes is then estimated from the time of the fewest, and
+    lowered until the target is met.
+    """
+    while True:
+        hasher = PasswordHasher(MIN_TIME_COST, memory_cost, parallelism)
+        duration = time_hash(hasher)
+        if duration <= target or memory_cost <= MIN_MEMORY_COST:
+            break
+        memory_cost = max(memory_cost // 2, MIN_MEMORY_COST)
+    time_cost = max(int(target * MIN_TIME_COST / duration), MIN_TIME_COST)
+    while time_cost > MIN_TIME_COST:
+        hasher = PasswordHasher(time_cost, memory_cost, parallelism)
+        duration = time_hash(hasher)
+        if duration <= target:
+            break
+        time_cost -= 1
+    return hasher, duration
+
+
+@click.command()
+@click.option(
+    "--target-ms",
+    type=click.IntRange(min=1),
+    default=250,
+    show_default=True,
+    help="Duration of the hash of a login to aim for, in milliseconds.",
+)
+@click.option(
+    "--memory",
+    type=click.IntRange(min=MIN_MEMORY_COST // 1024),
+    help="Memory used by a hash at most, in MiB. The current setting by default.",
+)
+@click.option(
+    "--parallelism",
+    type=click.IntRange(min=1),
+    help="Threads of a hash. The current setting by default.",
+)
+@click.option("--save", is_flag=True, help="Write the parameters in the .env file.")
+def calibrate_hash(target_ms, memory, parallelism, save):
+    """Measure the machine and pick the cost of the password hashes
+
+    Args:
+        target_ms (int): Duration of a hash to aim for, set by --target-ms.
+        memory (int | None): Memory of a hash at most in MiB, set by --memory.
+        parallelism (int | None): Threads of a hash, set by --parallelism.
+        save (bool): If True, write the parameters in the .env file.
+    """
+    current = get_password_hasher()
+    views.view.display_message("Measuring the duration of the hashes...")
+    hasher, duration = calibrate_hasher(
+        target_ms / 1000,
+        memory * 1024 if memory else current.memory_cost,
+        parallelism or current.parallelism,
+    )
+    settings = {
+        "ARGON2_TIME_COST": str(hasher.time_cost),
+        "ARGON2_MEMORY_COST": str(hasher.memory_cost),
+        "ARGON2_PARALLELISM": str(hasher.parallelism),
+    }
+    views.view.display_message(
+        f"A hash takes {duration * 1000:.0f} ms with {hasher.time_cost} passes "
+        f"over {hasher.memory_cost // 1024} MiB and {hasher.parallelism} threads."
+    )
+    if not save:
+        views.view.display_message(
+            "Settings of the .env file, use --save to write them:"
+        )
+        for name, value in settings.items():
+            views.view.display_message(f"{name}={value}")
+        return
+    for name, value in settings.items():
+        write_env_variable(name, value)
+    # for the next logins of a long lived process (shell)
+    os.environ.update(settings)
+    get_password_hasher.cache_clear()
+    views.view.display_message(
+        "Hash parameters saved, the passwords are rehashed at their next login.",
+        "green",
+    )
+
+
 if __name__ == "__main__":
     init_db()
@@ -1,3 +1,23 @@
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Mapped, declarative_base, declared_attr, mapped_column
 
 Base = declarative_base()
+
+
+class Versioned:
+    """Optimistic concurrency control. The UPDATE and DELETE statements of the
+    ORM only match the version of the row which was read, and raise
+    StaleDataError when someone else changed it meanwhile, so that no row has
+    to stay locked while a user edits it. The rows inserted without the ORM get
+    the first version from the server default."""
+
+    version_id: Mapped[int] = mapped_column(nullable=False, server_default="1")
+
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version_id}
+
+
+# The models reference each other by name, they must all be registered whichever
+# one is imported first (commands load only their own controller).
+from models import client, collaborator, contract, event  # noqa: E402, F401
+from models import revoked_token  # noqa: E402, F401
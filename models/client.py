@@ -1,14 +1,19 @@
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import DDL, String, DateTime, ForeignKey, Index, event
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 from sqlalchemy.sql import func
 
-from models import Base
+from models import Base, Versioned
 
 
-class Client(Base):
+class Client(Versioned, Base):
     __tablename__ = "client"
+    __table_args__ = (
+        # --assigned listings in id order, and the RESTRICT check when a
+        # collaborator is deleted
+        Index("ix_client_sales_contact_id_id", "sales_contact_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(
         primary_key=True, autoincrement=True, nullable=False
@@ -51,3 +56,20 @@ class Client(Base):
             f" {self.phone_number}, "
             f"company: {self.company}, sales contact: {self.sales_contact_id}"
         )
+
+
+# text matched by search-clients, indexed by trigrams so that approximate
+# matches on any of its words don't scan the table. A GiST index, unlike GIN,
+# also returns them most similar first, ranked without reading every match.
+SEARCH_TEXT = Client.full_name + " " + Client.company + " " + Client.email
+
+Index(
+    "ix_client_search_gist_trgm",
+    SEARCH_TEXT.label("search_text"),
+    postgresql_using="gist",
+    postgresql_ops={"search_text": "gist_trgm_ops"},
+)
+
+event.listen(
+    Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
@@ -1,12 +1,12 @@
 from sqlalchemy import String, Enum
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 
-from models import Base
+from models import Base, Versioned
 from utils import util
 from utils.permissions import PermissionManager, RoleType
 
 
-class Collaborator(Base):
+class Collaborator(Versioned, Base):
     __tablename__ = "collaborator"
 
     id: Mapped[int] = mapped_column(
@@ -1,10 +1,10 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Enum, func
+from sqlalchemy import DateTime, ForeignKey, Enum, Index, func, text
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 
-from models import Base
+from models import Base, Versioned
 
 
 class Status(enum.Enum):
@@ -13,8 +13,22 @@ class Status(enum.Enum):
     CANCELLED = "cancelled"
 
 
-class Contract(Base):
+class Contract(Versioned, Base):
     __tablename__ = "contract"
+    __table_args__ = (
+        # --assigned listings in id order, and the SET NULL update when a
+        # collaborator is deleted
+        Index("ix_contract_sales_contact_id_id", "sales_contact_id", "id"),
+        # RESTRICT check when a client is deleted
+        Index("ix_contract_client_id", "client_id"),
+        Index("ix_contract_status_id", "status", "id"),
+        # --remaining-amount only matches the contracts not paid yet
+        Index(
+            "ix_contract_unpaid_id",
+            "id",
+            postgresql_where=text("remaining_amount > 0"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(
         primary_key=True, autoincrement=True, nullable=False
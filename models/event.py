@@ -1,13 +1,34 @@
 import datetime
 
-from sqlalchemy import ForeignKey, String, Date, Time, Text
+from sqlalchemy import ForeignKey, String, Date, Time, Text, Index, text
 from sqlalchemy.orm import relationship, backref, mapped_column, Mapped
 
-from models import Base
+from models import Base, Versioned
 
 
-class Event(Base):
+class Event(Versioned, Base):
     __tablename__ = "event"
+    __table_args__ = (
+        # --assign assigned listings in id order, and the SET NULL update when
+        # a collaborator is deleted
+        Index("ix_event_support_contact_id_id", "support_contact_id", "id"),
+        # --assign assigned listings filtered by date, e.g. --upcoming 7
+        Index(
+            "ix_event_support_contact_id_start_date",
+            "support_contact_id",
+            "start_date",
+        ),
+        # CASCADE delete when a contract is deleted
+        Index("ix_event_contract_id", "contract_id"),
+        # queue of the events left to assign, by start date: --assign
+        # no-contact and claim-event
+        Index(
+            "ix_event_unassigned_start_date_id",
+            "start_date",
+            "id",
+            postgresql_where=text("support_contact_id IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(
         primary_key=True, autoincrement=True, nullable=False
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base
+
+
+class RevokedToken(Base):
+    """Refresh tokens revoked before their expiry, by id. A refresh looks its
+    token up by primary key; the rows of the expired tokens are purged on
+    logout, through the index of their expiry."""
+
+    __tablename__ = "revoked_token"
+
+    jti: Mapped[str] = mapped_column(String(36), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
+
+    def __init__(self, jti, expires_at):
+        super().__init__()
+        self.jti = jti
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"RevokedToken {self.jti}, expires at {self.expires_at}"
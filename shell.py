@@ -0,0 +1,73 @@
+import shlex
+
+import click
+import sentry_sdk
+
+import db_config
+from views import view
+
+EXIT_COMMANDS = ("exit", "quit")
+
+
+def warm_up(group, ctx):
+    """Import every command module and open the first pooled connection,
+    so that the commands run in the shell don't pay for it. The engine is
+    sized for the many commands of a long lived process."""
+    for name in group.list_commands(ctx):
+        group.get_command(ctx, name)
+    db_config.use_long_lived_engine()
+    try:
+        with db_config.get_engine().connect():
+            pass
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        view.display_error(str(e))
+
+
+def run_command(group, args):
+    """Run a command of the group in-process, without leaving the shell on
+    errors or aborted prompts."""
+    try:
+        group.main(args, prog_name="epicevent", standalone_mode=False)
+    except click.ClickException as e:
+        e.show()
+    except click.Abort:
+        view.display_error("Aborted!")
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        view.display_error(str(e))
+
+
+@click.command()
+@click.pass_context
+def shell(ctx):
+    """Run commands in a persistent session.
+
+    The database engine, its connection pool, the imported models and the
+    decoded token are kept between commands.
+    """
+    group = ctx.find_root().command
+    warm_up(group, ctx)
+    view.display_message(
+        "EpicEvent shell. Type 'help' to list the commands, 'exit' to quit.", "blue"
+    )
+    while True:
+        try:
+            line = view.get_command_line()
+        except click.Abort:
+            break
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            view.display_error(str(e))
+            continue
+        if not args:
+            continue
+        if args[0] in EXIT_COMMANDS:
+            break
+        if args[0] == "help":
+            args = ["--help"]
+        if args[0] == ctx.info_name:
+            view.display_error("Already in the shell.")
+            continue
+        run_command(group, args)
@@ -1,11 +1,22 @@
+import csv
+import json
 from unittest.mock import patch
 
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
 from controllers.client_controller import (
     get_clients,
+    search_clients,
+    resolve_clients,
+    import_clients,
     create_client,
     update_client,
 )
 from models.client import Client
+from models.collaborator import Collaborator
+from utils.permissions import RoleType
 
 
 def test_get_clients_success(runner, db_session, management_user, test_client):
@@ -78,6 +89,133 @@ def test_update_client_success(runner, db_session, sales_user, test_client):
         assert test_client.company == "Updated company"
 
 
+def test_update_clients_with_options(
+    runner, db_session, management_user, sales_user, count_queries
+):
+    """Test updating the clients of a company in a single UPDATE, only the
+    clients of the sales contact being updated."""
+    clients = [
+        Client("Client A", "a@test.com", "0123456701", "Acme", sales_user.id),
+        Client("Client B", "b@test.com", "0123456702", "Acme", sales_user.id),
+        Client("Client C", "c@test.com", "0123456703", "Acme", management_user.id),
+    ]
+    db_session.add_all(clients)
+    db_session.commit()
+    ids = [client.id for client in clients]
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ), count_queries() as statements:
+        result = runner.invoke(
+            update_client, ["--where-company", "Acme", "--company", "Acme Corp"]
+        )
+    assert "2 clients updated." in result.output
+    assert len([s for s in statements if s.lstrip().startswith("UPDATE")]) == 1
+    db_session.expire_all()
+    assert [db_session.get(Client, id).company for id in ids] == [
+        "Acme Corp",
+        "Acme Corp",
+        "Acme",
+    ]
+
+
+def test_update_clients_duplicate_email(runner, db_session, sales_user):
+    """Test a non-interactive update breaking a unique constraint."""
+    clients = [
+        Client("Client A", "a@test.com", "0123456701", "Acme", sales_user.id),
+        Client("Client B", "b@test.com", "0123456702", "Acme", sales_user.id),
+    ]
+    db_session.add_all(clients)
+    db_session.commit()
+    client_id = clients[0].id
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(
+            update_client, ["--id", str(client_id), "--email", "b@test.com"]
+        )
+
+    assert result.exit_code == 0
+    assert "Invalid value: Key (email)=(b@test.com) already exists." in result.output
+
+
+def test_update_clients_value_too_long(runner, db_session, sales_user):
+    """Test a non-interactive update with a value too long for its column."""
+    client = Client("Client A", "a@test.com", "0123456701", "Acme", sales_user.id)
+    db_session.add(client)
+    db_session.commit()
+    client_id = client.id
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(
+            update_client, ["--id", str(client_id), "--company", "A" * 200]
+        )
+
+    assert result.exit_code == 0
+    assert result.output == (
+        "Invalid value: value too long for type character varying(150).\n"
+    )
+
+
+def test_update_client_conflict(runner, test_db):
+    """Test no connection is held while a client is edited, and the edits are
+    dropped when someone else changed the client meanwhile."""
+    with Session(test_db) as session:
+        sales = Collaborator(
+            "sales@test.com", "password123!", "Sales", "User", "01", RoleType.SALES
+        )
+        session.add(sales)
+        session.commit()
+        client = Client("Client", "client@test.com", "03", "Test", sales.id)
+        session.add(client)
+        session.commit()
+        sales_id, client_id = sales.id, client.id
+    checked_out = []
+    choices = iter(["4", "0"])
+
+    def edit_concurrently():
+        # someone else renames the client while the company is being edited
+        checked_out.append(test_db.pool.checkedout())
+        choice = next(choices)
+        if choice == "4":
+            with Session(test_db) as other:
+                other.get(Client, client_id).full_name = "Changed"
+                other.commit()
+        return choice
+
+    with patch(
+        "controllers.client_controller.Session",
+        side_effect=lambda bind: Session(test_db),
+    ), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_id},
+    ), patch(
+        "controllers.client_controller.util.ask_for_input",
+        side_effect=["client@test.com", "Updated company"],
+    ), patch(
+        "controllers.client_controller.view.display_edit_client",
+        side_effect=edit_concurrently,
+    ):
+        result = runner.invoke(update_client)
+
+    assert result.exit_code == 0
+    assert checked_out == [0, 0]
+    assert "has been modified by someone else" in result.output
+    with Session(test_db) as session:
+        client = session.get(Client, client_id)
+        assert (client.full_name, client.company, client.version_id) == (
+            "Changed",
+            "Test",
+            2,
+        )
+
+
 def test_update_client_not_found(runner, db_session, sales_user):
     """Test updating a non-existent client."""
     with patch("controllers.client_controller.Session", return_value=db_session), patch(
@@ -93,3 +231,322 @@ def test_update_client_not_found(runner, db_session, sales_user):
 
         assert result.exit_code == 0
         mock_display_error.assert_called_once_with("No client found.")
+
+
+def test_get_clients_pagination(runner, db_session, sales_user):
+    """Test paging through the clients with --limit, --after and --sort."""
+    clients = [
+        Client(
+            f"Client {i}", f"client{i}@test.com", f"012345670{i}", "Test", sales_user.id
+        )
+        for i in range(3)
+    ]
+    db_session.add_all(clients)
+    db_session.commit()
+    first, second, third = (str(client) for client in clients)
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(get_clients, ["--limit", "2"])
+        assert result.exit_code == 0
+        assert first in result.output and second in result.output
+        assert third not in result.output
+        assert f"More results with --after {clients[1].id}" in result.output
+
+        result = runner.invoke(
+            get_clients, ["--limit", "2", "--after", str(clients[1].id)]
+        )
+        assert result.exit_code == 0
+        assert result.output == f"{third}\n"
+
+        result = runner.invoke(get_clients, ["--sort", "desc", "--limit", "1"])
+        assert result.exit_code == 0
+        assert result.output.startswith(f"{third}\n")
+
+
+def test_get_clients_stream(runner, db_session, sales_user, test_client, count_queries):
+    """Test streaming the clients from a server-side cursor."""
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        buffered = runner.invoke(get_clients, ["--buffered"])
+        with count_queries() as statements:
+            streamed = runner.invoke(get_clients, ["--stream"])
+
+        assert streamed.exit_code == 0
+        assert streamed.output == buffered.output == f"{test_client}\n"
+        assert len(statements) == 1
+
+
+def test_get_clients_formats(
+    runner, db_session, sales_user, test_client, count_queries
+):
+    """Test the machine readable formats, selecting only the requested columns."""
+    client_id = test_client.id
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        with count_queries() as statements:
+            result = runner.invoke(
+                get_clients, ["--format", "json", "--fields", "full_name,email"]
+            )
+        assert result.exit_code == 0
+        assert json.loads(result.output) == [
+            {"full_name": "Test Client", "email": "client@test.com"}
+        ]
+        assert "client.company" not in statements[0]
+
+        result = runner.invoke(get_clients, ["--format", "ndjson", "--fields", "id"])
+        assert result.exit_code == 0
+        assert result.output == f'{{"id": {client_id}}}\n'
+
+        result = runner.invoke(
+            get_clients, ["--format", "csv", "--fields", "full_name,company"]
+        )
+        assert result.exit_code == 0
+        assert result.output == "full_name,company\nTest Client,Test Company\n"
+
+        result = runner.invoke(get_clients, ["--format", "json", "--assigned"])
+        assert result.exit_code == 0
+        assert json.loads(result.output)[0]["sales_contact_id"] == sales_user.id
+        assert "version_id" not in json.loads(result.output)[0]
+
+
+def test_get_clients_formats_empty(runner, db_session, sales_user):
+    """Test the formats of an empty listing."""
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(get_clients, ["--format", "json"])
+        assert result.exit_code == 0
+        assert json.loads(result.output) == []
+
+        result = runner.invoke(get_clients, ["--format", "csv", "--fields", "id,email"])
+        assert result.output == "id,email\n"
+
+
+def test_get_clients_invalid_fields(runner, db_session, sales_user):
+    """Test the fields validation."""
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(get_clients, ["--format", "csv", "--fields", "salary"])
+        assert result.exit_code == 2
+        assert "Unknown field salary" in result.output
+
+        result = runner.invoke(
+            get_clients, ["--format", "csv", "--fields", "version_id"]
+        )
+        assert result.exit_code == 2
+        assert "Unknown field version_id" in result.output
+
+        result = runner.invoke(get_clients, ["--fields", "email"])
+        assert result.exit_code == 2
+        assert "--fields requires --format" in result.output
+
+
+def test_search_clients(runner, db_session, sales_user, test_client):
+    """Test searching clients with approximate matches, most similar first."""
+    clients = [
+        Client("Jean Dupont", "jean@dupont.fr", "0600000001", "Acme", sales_user.id),
+        Client("Jeanne Durand", "jd@mail.com", "0600000002", "Acmee", sales_user.id),
+    ]
+    db_session.add_all(clients)
+    db_session.commit()
+    dupont, durand = (str(client) for client in clients)
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(search_clients, ["dupond"])
+        assert result.exit_code == 0
+        assert result.output == f"{dupont}\n"
+
+        result = runner.invoke(search_clients, ["acme"])
+        assert result.output == f"{dupont}\n{durand}\n"
+
+        result = runner.invoke(search_clients, ["acme", "--limit", "1"])
+        assert result.output == f"{dupont}\n"
+
+        result = runner.invoke(search_clients, ["zzzz"])
+        assert result.output == "No clients found.\n"
+
+
+def test_search_clients_ranks_all_matches(runner, db_session, sales_user):
+    """Test the best match is found after many weaker ones."""
+    db_session.add_all(
+        Client(
+            f"Client {i}", f"c{i}@mail.com", f"06100000{i:02}", "Acmes", sales_user.id
+        )
+        for i in range(50)
+    )
+    jane = Client("Jane Acme", "jane@mail.com", "0610000099", "Other", sales_user.id)
+    db_session.add(jane)
+    db_session.commit()
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(search_clients, ["acme", "--limit", "1"])
+
+    assert result.output == f"{jane}\n"
+
+
+def test_resolve_clients(runner, test_db, async_test_db, tmp_path):
+    """Test finding the clients of emails given as arguments and in a file."""
+    with Session(test_db) as session:
+        sales = Collaborator(
+            email="sales@test.com",
+            password="password123!",
+            first_name="Sales",
+            name="User",
+            phone_number="0123456788",
+            role=RoleType.SALES,
+        )
+        session.add(sales)
+        session.flush()
+        client = Client("Jean Dupont", "jean@dupont.fr", "0600000001", "Acme", sales.id)
+        session.add(client)
+        session.commit()
+        expected, sales_id = str(client), sales.id
+    file = tmp_path / "emails.txt"
+    file.write_text("jean@dupont.fr\n\nunknown@mail.com\n")
+
+    with patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_id},
+    ):
+        result = runner.invoke(resolve_clients, ["jean@dupont.fr"])
+        assert result.exit_code == 0
+        assert result.output == f"{expected}\n"
+
+        result = runner.invoke(resolve_clients, ["--file", str(file)])
+        assert result.output == (
+            f"{expected}\nNo client found with the email unknown@mail.com.\n"
+        )
+
+        result = runner.invoke(resolve_clients)
+        assert "Give the emails as arguments or with --file." in result.output
+
+
+def test_import_clients(runner, db_session, sales_user, test_client, tmp_path):
+    """Test importing clients, rejecting the invalid and existing ones."""
+    file = tmp_path / "clients.csv"
+    file.write_text(
+        "full_name,email,phone_number,company\n"
+        "Test Client,client@test.com,0600000005,Acme\n"
+        "Jean Dupont,jean@dupont.fr,0600000001,\\N\n"
+        "Marie Curie,not an email,0600000002,Acme\n"
+        "Paul Martin,paul@martin.fr,0600000003,\n"
+        "Paul Copy,paul@martin.fr,0600000004,Acme\n"
+    )
+    sales_id = sales_user.id
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_id},
+    ):
+        result = runner.invoke(import_clients, [str(file)])
+
+    assert result.exit_code == 0
+    assert "2 clients imported." in result.output
+    assert "3 rows rejected" in result.output
+    imported = db_session.scalars(
+        select(Client).where(Client.email.in_(["jean@dupont.fr", "paul@martin.fr"]))
+    ).all()
+    # a value spelled like a NULL marker is kept as it is
+    assert {client.company for client in imported} == {"\\N", "Not specified"}
+    assert {client.sales_contact_id for client in imported} == {sales_id}
+
+    # in the order of the file, although the existing client is found last
+    with open(tmp_path / "clients.rejects.csv", newline="") as rejects:
+        rows = list(csv.DictReader(rejects))
+    assert [(row["line"], row["email"]) for row in rows] == [
+        ("2", "client@test.com"),
+        ("4", "not an email"),
+        ("6", "paul@martin.fr"),
+    ]
+    assert "already exists" in rows[0]["errors"]
+    assert rows[1]["errors"] == "Invalid email address."
+    assert rows[2]["errors"] == "Duplicate email in the file."
+
+
+def test_import_clients_ndjson(runner, db_session, sales_user, tmp_path):
+    """Test importing clients from an NDJSON file."""
+    file = tmp_path / "clients.ndjson"
+    file.write_text(
+        '{"full_name": "Jean Dupont", "email": "jean@dupont.fr",'
+        ' "phone_number": 600000001, "company": "Acme"}\n'
+        "not json\n"
+        '{"full_name": "Marie Curie", "email": "marie@curie.fr"}\n'
+    )
+    rejects = tmp_path / "rejects.csv"
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(import_clients, [str(file), "--rejects", str(rejects)])
+
+    assert result.exit_code == 0
+    assert "1 clients imported." in result.output
+    client = db_session.scalars(
+        select(Client).where(Client.email == "jean@dupont.fr")
+    ).one()
+    assert client.phone_number == "600000001"
+    with rejects.open(newline="") as file:
+        errors = [row["errors"] for row in csv.DictReader(file)]
+    assert errors == ["Malformed line.", "Missing phone_number."]
+
+
+def test_import_clients_too_long(runner, db_session, sales_user, tmp_path):
+    """Test a value too long for its column rejects its row, not the import."""
+    file = tmp_path / "clients.csv"
+    file.write_text(
+        "full_name,email,phone_number,company\n"
+        f"Jean Dupont,jean@dupont.fr,0600000001,{'A' * 200}\n"
+        "Marie Curie,marie@curie.fr,0600000002,Acme\n"
+    )
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ):
+        result = runner.invoke(import_clients, [str(file)])
+
+    assert result.exit_code == 0
+    assert "1 clients imported." in result.output
+    with open(tmp_path / "clients.rejects.csv", newline="") as rejects:
+        rows = list(csv.DictReader(rejects))
+    assert [(row["line"], row["errors"]) for row in rows] == [
+        ("2", "company must be at most 150 characters long.")
+    ]
+
+
+def test_import_clients_failed(runner, db_session, sales_user, tmp_path):
+    """Test an import refused by the database exits with an error."""
+    file = tmp_path / "clients.csv"
+    file.write_text(
+        "full_name,email,phone_number,company\n"
+        "Jean Dupont,jean@dupont.fr,0600000001,Acme\n"
+    )
+
+    with patch("controllers.client_controller.Session", return_value=db_session), patch(
+        "controllers.client_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ), patch(
+        "controllers.client_controller.bulk.copy_rows",
+        side_effect=OperationalError("COPY", {}, Exception("connection lost")),
+    ):
+        result = runner.invoke(import_clients, [str(file)])
+
+    assert result.exit_code == 1
+    assert result.output == "Import failed, nothing was imported: connection lost\n"
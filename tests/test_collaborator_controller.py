@@ -1,5 +1,9 @@
 from unittest.mock import patch
 
+from argon2 import PasswordHasher
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
 from controllers.collaborator_controller import (
     create_collaborator,
     update_collaborator,
@@ -8,6 +12,7 @@ from controllers.collaborator_controller import (
     logout,
 )
 from models.collaborator import Collaborator
+from utils import util
 from utils.permissions import RoleType
 
 
@@ -69,6 +74,56 @@ def test_create_collaborator_duplicate_email(runner, db_session, management_user
         )
 
 
+def test_create_collaborator_conflict(runner, test_db):
+    """Test no connection is held while the collaborator is asked for, and the
+    creation is refused when someone else took the email meanwhile."""
+    checked_out = []
+
+    def ask_password(message, validate_function):
+        # someone else creates a collaborator with the same email
+        checked_out.append(test_db.pool.checkedout())
+        with Session(test_db) as other:
+            other.add(
+                Collaborator(
+                    "new@collaborator.com",
+                    "password123!",
+                    "Other",
+                    "Collaborator",
+                    "0123456789",
+                    RoleType.SALES,
+                )
+            )
+            other.commit()
+        return "password123!"
+
+    with patch(
+        "controllers.collaborator_controller.Session",
+        side_effect=lambda bind: Session(test_db),
+    ), patch(
+        "controllers.collaborator_controller.util.get_token",
+        return_value={"role": "management", "id": 1},
+    ), patch(
+        "controllers.collaborator_controller.util.ask_for_input",
+        side_effect=["new@collaborator.com", "0123456781", "New", "Collaborator"],
+    ), patch(
+        "controllers.collaborator_controller.util.ask_for_password",
+        side_effect=ask_password,
+    ), patch(
+        "controllers.collaborator_controller.util.choose_from_enum",
+        return_value=RoleType.MANAGEMENT,
+    ):
+        result = runner.invoke(create_collaborator)
+
+    assert result.exit_code == 0
+    assert checked_out == [0]
+    assert "This email or phone number already exists." in result.output
+    with Session(test_db) as session:
+        collaborator = session.scalars(
+            select(Collaborator).where(Collaborator.email == "new@collaborator.com")
+        ).one()
+        assert collaborator.first_name == "Other"
+
+
 def test_update_collaborator_success(runner, db_session, management_user):
     """Test updating a collaborator."""
 
@@ -90,6 +145,30 @@ def test_update_collaborator_success(runner, db_session, management_user):
         assert management_user.first_name == "Updated"
 
 
+def test_update_collaborator_with_options(
+    runner, db_session, management_user, sales_user
+):
+    """Test updating a collaborator with options instead of the menu."""
+    sales_id = sales_user.id
+
+    with patch(
+        "controllers.collaborator_controller.Session", return_value=db_session
+    ), patch(
+        "controllers.collaborator_controller.util.get_token",
+        return_value={"role": "management", "id": management_user.id},
+    ):
+        result = runner.invoke(
+            update_collaborator,
+            ["--id", str(sales_id), "--role", "support", "--last-name", "Updated"],
+        )
+
+    assert result.exit_code == 0
+    assert "1 collaborators updated." in result.output
+    db_session.expire_all()
+    collaborator = db_session.get(Collaborator, sales_id)
+    assert (collaborator.role, collaborator.name) == (RoleType.SUPPORT, "Updated")
+
+
 def test_update_collaborator_not_found(runner, db_session, management_user):
     """Test updating a non-existent collaborator."""
     with patch(
@@ -171,6 +250,34 @@ def test_login_success(runner, db_session, management_user):
         mock_save_token.assert_called_once()
 
 
+def test_login_rehashes_outdated_hash(runner, db_session, management_user):
+    """Test that a hash made with another cost is replaced on login."""
+    management_user.password = PasswordHasher(time_cost=1).hash("password123!")
+    db_session.commit()
+    user_id = management_user.id
+    with patch(
+        "controllers.collaborator_controller.Session", return_value=db_session
+    ), patch(
+        "controllers.collaborator_controller.util.ask_for_input",
+        side_effect=[management_user.email],
+    ), patch(
+        "controllers.collaborator_controller.util.ask_for_password",
+        side_effect=["password123!"],
+    ), patch(
+        "controllers.collaborator_controller.util.create_token"
+    ) as mock_save_token:
+        result = runner.invoke(login)
+
+        assert result.exit_code == 0
+        mock_save_token.assert_called_once()
+
+    password = db_session.scalar(
+        select(Collaborator.password).where(Collaborator.id == user_id)
+    )
+    assert util.needs_rehash(password) is False
+    assert util.verify_password("password123!", password)
+
+
 def test_login_invalid_credentials(runner, db_session, management_user):
     """Test login with invalid credentials."""
     with patch(
@@ -1,9 +1,13 @@
+import csv
 from unittest.mock import patch
 
+from sqlalchemy import select
+
 from controllers.contract_controller import (
     get_contracts,
     create_contract,
     update_contract,
+    import_contracts,
 )
 from models.collaborator import Collaborator
 from models.contract import Contract, Status
@@ -52,6 +56,33 @@ def test_get_contracts_with_status_filter(
         assert str(test_contract) in result.output
 
 
+def test_get_contracts_query_count(
+    runner, db_session, management_user, test_client, sales_user, count_queries
+):
+    """Test the contracts and their relationships are read in one query."""
+    contracts = [
+        Contract(str(amount), "0", Status.SIGNED, test_client.id, sales_user.id)
+        for amount in (1000, 2000, 3000)
+    ]
+    db_session.add_all(contracts)
+    db_session.commit()
+    contract_ids = [contract.id for contract in contracts]
+    db_session.expire_all()
+
+    with patch(
+        "controllers.contract_controller.Session", return_value=db_session
+    ), patch(
+        "controllers.contract_controller.util.get_token",
+        return_value={"role": "management", "id": management_user.id},
+    ), count_queries() as statements:
+        result = runner.invoke(get_contracts)
+
+    assert result.exit_code == 0
+    assert len(statements) == 1
+    for contract_id in contract_ids:
+        assert f"Contract {contract_id} for client: Test Client" in result.output
+
+
 def test_create_contract_success(
     runner, db_session, management_user, test_client, sales_user
 ):
@@ -179,3 +210,138 @@ def test_update_contract_not_authorized(runner, db_session, test_contract):
         mock_display_error.assert_called_once_with(
             "You are not authorized to update an contract to which you are not assigned."
         )
+
+
+def test_update_contracts_with_options(
+    runner, db_session, management_user, test_client, sales_user, count_queries
+):
+    """Test updating the contracts selected by options in a single UPDATE, a
+    sales contact only updating their own contracts."""
+    contracts = [
+        Contract("1000", "1000", Status.PENDING, test_client.id, sales_user.id),
+        Contract("1000", "1000", Status.PENDING, test_client.id, sales_user.id),
+        Contract("1000", "1000", Status.SIGNED, test_client.id, sales_user.id),
+        Contract("1000", "1000", Status.PENDING, test_client.id, management_user.id),
+    ]
+    db_session.add_all(contracts)
+    db_session.commit()
+    ids = [contract.id for contract in contracts]
+
+    with patch(
+        "controllers.contract_controller.Session", return_value=db_session
+    ), patch(
+        "controllers.contract_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_user.id},
+    ), count_queries() as statements:
+        result = runner.invoke(
+            update_contract,
+            [
+                "--where-status",
+                "pending",
+                "--status",
+                "signed",
+                "--remaining-amount",
+                "0",
+            ],
+        )
+
+    assert result.exit_code == 0
+    assert "2 contracts updated." in result.output
+    assert len([s for s in statements if s.lstrip().startswith("UPDATE")]) == 1
+    assert not [s for s in statements if s.lstrip().startswith("SELECT")]
+    db_session.expire_all()
+    assert [
+        (contract.status, contract.remaining_amount)
+        for contract in (db_session.get(Contract, id) for id in ids)
+    ] == [
+        (Status.SIGNED, 0),
+        (Status.SIGNED, 0),
+        (Status.SIGNED, 1000),
+        (Status.PENDING, 1000),
+    ]
+
+
+def test_update_contracts_invalid_options(
+    runner, db_session, management_user, test_client, sales_user
+):
+    """Test the options of a non-interactive update are checked."""
+    contract = Contract("1000", "0", Status.SIGNED, test_client.id, sales_user.id)
+    db_session.add(contract)
+    db_session.commit()
+    contract_id, manager_id, sales_id = contract.id, management_user.id, sales_user.id
+
+    with patch(
+        "controllers.contract_controller.Session", return_value=db_session
+    ), patch(
+        "controllers.contract_controller.util.get_token",
+        return_value={"role": "management", "id": manager_id},
+    ):
+        no_selection = runner.invoke(update_contract, ["--status", "cancelled"])
+        not_sales = runner.invoke(
+            update_contract,
+            ["--id", str(contract_id), "--sales-contact-id", str(manager_id)],
+        )
+        invalid = runner.invoke(
+            update_contract, ["--id", str(contract_id), "--total-amount", "a lot"]
+        )
+
+    assert "Select the contracts to update" in no_selection.output
+    assert "No contracts updated" in not_sales.output
+    assert invalid.exit_code == 2
+    assert "You must enter a decimal number." in invalid.output
+    db_session.expire_all()
+    contract = db_session.get(Contract, contract_id)
+    assert (contract.status, contract.sales_contact_id) == (Status.SIGNED, sales_id)
+
+
+def test_import_contracts(
+    runner,
+    db_session,
+    management_user,
+    test_client,
+    sales_user,
+    tmp_path,
+    count_queries,
+):
+    """Test importing contracts, their clients being checked by batch."""
+    client_id, sales_id = test_client.id, sales_user.id
+    file = tmp_path / "contracts.csv"
+    file.write_text(
+        "client_id,total_amount,remaining_amount,status\n"
+        f"{client_id},1000,250.5,signed\n"
+        f'{client_id},"2000,5",0,pending\n'
+        "999999,1000,0,signed\n"
+        f"{client_id},1000,0,unknown\n"
+        "99999999999,1000,0,signed\n"
+        f"{client_id},1e400,0,signed\n"
+    )
+
+    with patch(
+        "controllers.contract_controller.Session", return_value=db_session
+    ), patch(
+        "controllers.contract_controller.util.get_token",
+        return_value={"role": "management", "id": management_user.id},
+    ), count_queries() as statements:
+        result = runner.invoke(import_contracts, [str(file)])
+
+    assert result.exit_code == 0
+    assert "2 contracts imported." in result.output
+    assert len([s for s in statements if s.lstrip().startswith("SELECT")]) == 1
+    contracts = db_session.scalars(
+        select(Contract).where(Contract.client_id == client_id).order_by(Contract.id)
+    ).all()
+    assert [
+        (c.total_amount, c.remaining_amount, c.status, c.sales_contact_id)
+        for c in contracts
+    ] == [
+        (1000, 250.5, Status.SIGNED, sales_id),
+        (2000.5, 0, Status.PENDING, sales_id),
+    ]
+    with open(tmp_path / "contracts.rejects.csv", newline="") as rejects:
+        errors = [(row["line"], row["errors"]) for row in csv.DictReader(rejects)]
+    assert errors == [
+        ("4", "Client with id 999999 does not exist."),
+        ("5", "Status must be signed, pending or cancelled."),
+        ("6", "The number must be at most 2147483647."),
+        ("7", "You must enter a decimal number."),
+    ]
@@ -1,13 +1,20 @@
-from datetime import date, time
+import csv
+from datetime import date, time, timedelta
 from unittest.mock import patch
 
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
 from controllers.event_controller import (
     get_events,
     create_event,
     update_event,
+    claim_event,
+    import_events,
 )
+from models.client import Client
 from models.collaborator import Collaborator
-from models.contract import Status
+from models.contract import Contract, Status
 from models.event import Event
 from utils.permissions import RoleType
 
@@ -35,6 +42,51 @@ def test_get_events_with_filters(runner, db_session, support_user, test_event):
         assert str(test_event) in result.output
 
 
+def test_get_events_query_count(
+    runner,
+    db_session,
+    management_user,
+    test_client,
+    sales_user,
+    support_user,
+    count_queries,
+):
+    """Test the events and their support contacts are read in one query."""
+    contract = Contract("1000", "0", Status.SIGNED, test_client.id, sales_user.id)
+    db_session.add(contract)
+    db_session.commit()
+    events = [
+        Event(
+            date(2024, 1, day),
+            time(9, 0),
+            date(2024, 1, day),
+            time(17, 0),
+            "Test Location",
+            10,
+            contract.id,
+            support_user.id,
+        )
+        for day in (1, 2, 3)
+    ]
+    db_session.add_all(events)
+    db_session.commit()
+    contract_id = contract.id
+    event_ids = [event.id for event in events]
+    db_session.expire_all()
+
+    with patch("controllers.event_controller.Session", return_value=db_session), patch(
+        "controllers.event_controller.util.get_token",
+        return_value={"role": "management", "id": management_user.id},
+    ), count_queries() as statements:
+        result = runner.invoke(get_events)
+
+    assert result.exit_code == 0
+    assert len(statements) == 1
+    for event_id in event_ids:
+        assert f"Event {event_id} for contract {contract_id}" in result.output
+    assert result.output.count("Support contact: Support User.") == 3
+
+
 def test_create_event_success(
     runner, db_session, sales_user, test_contract, support_user
 ):
@@ -180,3 +232,283 @@ def test_update_event_not_authorized(
         mock_display_error.assert_called_once_with(
             "You are not authorized to update an event to which you are not assigned."
         )
+
+
+def add_events(session, contract_id, days, support_id=None):
+    today = date.today()
+    events = [
+        Event(
+            today + timedelta(days=day),
+            time(9, 0),
+            today + timedelta(days=day),
+            time(17, 0),
+            "Test Location",
+            10,
+            contract_id,
+            support_id,
+        )
+        for day in days
+    ]
+    session.add_all(events)
+    session.commit()
+    return [event.id for event in events]
+
+
+def test_get_events_no_contact(
+    runner, db_session, management_user, test_client, sales_user, support_user
+):
+    """Test the events without support contact are listed by start date."""
+    contract = Contract("1000", "0", Status.SIGNED, test_client.id, sales_user.id)
+    db_session.add(contract)
+    db_session.commit()
+    later, sooner = add_events(db_session, contract.id, (5, 2))
+    add_events(db_session, contract.id, (1,), support_user.id)
+
+    with patch("controllers.event_controller.Session", return_value=db_session), patch(
+        "controllers.event_controller.util.get_token",
+        return_value={"role": "management", "id": management_user.id},
+    ):
+        result = runner.invoke(get_events, ["--assign", "no-contact"])
+        assert result.exit_code == 0
+        assert result.output.count("No support assigned.") == 2
+        assert "Support User" not in result.output
+        assert result.output.index(f"Event {sooner} ") < result.output.index(
+            f"Event {later} "
+        )
+
+        result = runner.invoke(
+            get_events,
+            ["--assign", "no-contact", "--limit", "1", "--after", str(sooner)],
+        )
+        assert result.exit_code == 0
+        assert f"Event {later} " in result.output
+        assert f"Event {sooner} " not in result.output
+
+
+def test_update_events_with_options(
+    runner, db_session, management_user, test_client, sales_user, support_user
+):
+    """Test updating the events selected by options, a support contact only
+    updating their own events and not their support contact."""
+    contract = Contract("1000", "0", Status.SIGNED, test_client.id, sales_user.id)
+    db_session.add(contract)
+    db_session.commit()
+    contract_id, support_id = contract.id, support_user.id
+    manager_id = management_user.id
+    mine = add_events(db_session, contract_id, (1, 2), support_id)
+    unassigned = add_events(db_session, contract_id, (3,))
+
+    with patch("controllers.event_controller.Session", return_value=db_session):
+        with patch(
+            "controllers.event_controller.util.get_token",
+            return_value={"role": "support", "id": support_id},
+        ):
+            moved = runner.invoke(
+                update_event,
+                [
+                    "--where-contract-id",
+                    str(contract_id),
+                    "--location",
+                    "New Location",
+                    "--start-time",
+                    "10:30",
+                ],
+            )
+            reassigned = runner.invoke(
+                update_event, ["--id", str(mine[0]), "--support-contact-id", "1"]
+            )
+        with patch(
+            "controllers.event_controller.util.get_token",
+            return_value={"role": "management", "id": manager_id},
+        ):
+            assigned = runner.invoke(
+                update_event,
+                ["--id", str(unassigned[0]), "--support-contact-id", str(support_id)],
+            )
+
+    assert "2 events updated." in moved.output
+    assert "Only managers can change" in reassigned.output
+    assert "1 events updated." in assigned.output
+    db_session.expire_all()
+    events = [db_session.get(Event, id) for id in mine + unassigned]
+    assert [(event.location, event.start_time) for event in events] == [
+        ("New Location", time(10, 30)),
+        ("New Location", time(10, 30)),
+        ("Test Location", time(9, 0)),
+    ]
+    assert [event.support_contact_id for event in events] == [support_id] * 3
+
+
+def test_claim_event(runner, db_session, test_client, sales_user, support_user):
+    """Test claiming the next upcoming event without support contact."""
+    contract = Contract("1000", "0", Status.SIGNED, test_client.id, sales_user.id)
+    db_session.add(contract)
+    db_session.commit()
+    past, later, sooner = add_events(db_session, contract.id, (-1, 5, 2))
+    support_id = support_user.id
+
+    with patch("controllers.event_controller.Session", return_value=db_session), patch(
+        "controllers.event_controller.util.get_token",
+        return_value={"role": "support", "id": support_id},
+    ):
+        result = runner.invoke(claim_event)
+        assert result.exit_code == 0
+        assert f"Event {sooner} " in result.output
+        assert "has been assigned to you." in result.output
+        assert db_session.get(Event, sooner).support_contact_id == support_id
+
+        runner.invoke(claim_event)
+        assert db_session.get(Event, later).support_contact_id == support_id
+
+        result = runner.invoke(claim_event)
+        assert "No event left to assign." in result.output
+        assert db_session.get(Event, past).support_contact_id is None
+
+
+def test_claim_event_skips_locked_events(runner, test_db):
+    """Test an event being claimed by someone else is skipped, not waited for."""
+    with Session(test_db) as session:
+        sales = Collaborator(
+            "sales@test.com", "password123!", "Sales", "User", "01", RoleType.SALES
+        )
+        support = Collaborator(
+            "support@test.com",
+            "password123!",
+            "Support",
+            "User",
+            "02",
+            RoleType.SUPPORT,
+        )
+        session.add_all([sales, support])
+        session.commit()
+        client = Client("Client", "client@test.com", "03", "Test", sales.id)
+        session.add(client)
+        session.commit()
+        contract = Contract("1000", "0", Status.SIGNED, client.id, sales.id)
+        session.add(contract)
+        session.commit()
+        first, second = add_events(session, contract.id, (1, 2))
+        support_id = support.id
+
+    with test_db.connect() as other:
+        other.execute(select(Event).where(Event.id == first).with_for_update())
+        with patch(
+            "controllers.event_controller.Session", return_value=Session(test_db)
+        ), patch(
+            "controllers.event_controller.util.get_token",
+            return_value={"role": "support", "id": support_id},
+        ):
+            result = runner.invoke(claim_event)
+        other.rollback()
+
+    assert result.exit_code == 0
+    assert f"Event {second} " in result.output
+    with Session(test_db) as session:
+        assert session.get(Event, first).support_contact_id is None
+        assert session.get(Event, second).support_contact_id == support_id
+
+
+def test_get_events_dates(runner, db_session, support_user, test_client, sales_user):
+    """Test filtering the events on their start date."""
+    contract = Contract("1000", "0", Status.SIGNED, test_client.id, sales_user.id)
+    db_session.add(contract)
+    db_session.commit()
+    later, past, sooner, next_month = add_events(
+        db_session, contract.id, (3, -2, 1, 30), support_user.id
+    )
+    today = date.today()
+
+    with patch("controllers.event_controller.Session", return_value=db_session), patch(
+        "controllers.event_controller.util.get_token",
+        return_value={"role": "support", "id": support_user.id},
+    ):
+        result = runner.invoke(get_events, ["--assign", "assigned", "--upcoming", "7"])
+        assert result.exit_code == 0
+        assert f"Event {past} " not in result.output
+        assert f"Event {next_month} " not in result.output
+        assert result.output.index(f"Event {sooner} ") < result.output.index(
+            f"Event {later} "
+        )
+
+        end = today + timedelta(days=3)
+        result = runner.invoke(
+            get_events, ["--from", str(today), "--to", f"{end} 08:59"]
+        )
+        assert f"Event {sooner} " in result.output
+        assert f"Event {later} " not in result.output
+
+        result = runner.invoke(get_events, ["--to", str(end)])
+        assert f"Event {past} " in result.output
+        assert f"Event {later} " in result.output
+        assert f"Event {next_month} " not in result.output
+
+        result = runner.invoke(get_events, ["--from", "tomorrow"])
+        assert result.exit_code == 2
+        assert "yyyy-mm-dd or yyyy-mm-dd HH:MM" in result.output
+
+        result = runner.invoke(get_events, ["--upcoming", "7", "--to", str(end)])
+        assert "--upcoming can't be used with --from or --to." in result.output
+
+
+def test_import_events(
+    runner,
+    db_session,
+    test_client,
+    sales_user,
+    support_user,
+    management_user,
+    tmp_path,
+    count_queries,
+):
+    """Test importing events, their contracts and support contacts being
+    checked by batch."""
+    signed = Contract("1000", "0", Status.SIGNED, test_client.id, sales_user.id)
+    pending = Contract("1000", "0", Status.PENDING, test_client.id, sales_user.id)
+    other = Contract("1000", "0", Status.SIGNED, test_client.id, management_user.id)
+    db_session.add_all([signed, pending, other])
+    db_session.commit()
+    sales_id, support_id = sales_user.id, support_user.id
+    dates = "2025-06-01,09:00,2025-06-01,18:00"
+    file = tmp_path / "events.csv"
+    file.write_text(
+        "contract_id,start_date,start_time,end_date,end_time,location,attendees,"
+        "support_contact_id,note\n"
+        f"{signed.id},{dates},Paris,100,{support_id},VIP\n"
+        f"{signed.id},{dates},Lyon,50,,\n"
+        f"{pending.id},{dates},Paris,100,,\n"
+        f"{other.id},{dates},Paris,100,,\n"
+        f"{signed.id},{dates},Paris,100,{sales_id},\n"
+        f"{signed.id},{dates},Paris,100,999999,\n"
+        f"{signed.id},2025-13-01,09:00,2025-06-01,18:00,Paris,100,,\n"
+        f"{signed.id},{dates},{'P' * 201},100,,\n"
+        f"{signed.id},{dates},Paris,3000000000,,\n"
+    )
+    signed_id = signed.id
+
+    with patch("controllers.event_controller.Session", return_value=db_session), patch(
+        "controllers.event_controller.util.get_token",
+        return_value={"role": "sales", "id": sales_id},
+    ), count_queries() as statements:
+        result = runner.invoke(import_events, [str(file)])
+
+    assert result.exit_code == 0
+    assert "2 events imported." in result.output
+    assert len([s for s in statements if s.lstrip().startswith("SELECT")]) == 2
+    events = db_session.scalars(
+        select(Event).where(Event.contract_id == signed_id).order_by(Event.id)
+    ).all()
+    assert [(e.location, e.support_contact_id, e.note) for e in events] == [
+        ("Paris", support_id, "VIP"),
+        ("Lyon", None, ""),
+    ]
+    with open(tmp_path / "events.rejects.csv", newline="") as rejects:
+        errors = {row["line"]: row["errors"] for row in csv.DictReader(rejects)}
+    assert errors == {
+        "4": "The contract must be signed in order to create events.",
+        "5": "You are not authorized to create events for this contract.",
+        "6": "This collaborator cannot be assigned to a event.",
+        "7": "Collaborator with id 999999 does not exist.",
+        "8": "Your date must be yyyy-mm-dd.",
+        "9": "location must be at most 200 characters long.",
+        "10": "The number must be at most 2147483647.",
+    }
@@ -0,0 +1,48 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from controllers import async_access
+from models.client import Client
+from models.collaborator import Collaborator
+from utils.permissions import RoleType
+
+
+def test_scalars_concurrently(async_test_db):
+    """Test that the statements are in flight at once, up to the limit."""
+    statements = [select(func.pg_backend_pid(), func.pg_sleep(0.2))] * 4
+
+    pids = async_access.run(async_access.scalars_concurrently(statements))
+    assert len({pid for rows in pids for pid in rows}) == 4
+
+    pids = async_access.run(async_access.scalars_concurrently(statements, limit=2))
+    assert len({pid for rows in pids for pid in rows}) <= 2
+
+
+def test_resolve_client_emails(test_db, async_test_db):
+    """Test resolving emails in several batches, unknown ones to None."""
+    with Session(test_db) as session:
+        sales = Collaborator(
+            email="sales@test.com",
+            password="password123!",
+            first_name="Sales",
+            name="User",
+            phone_number="0123456788",
+            role=RoleType.SALES,
+        )
+        session.add(sales)
+        session.flush()
+        session.add_all(
+            Client(f"Client {i}", f"c{i}@mail.com", f"06000000{i:02}", "Acme", sales.id)
+            for i in range(5)
+        )
+        session.commit()
+    emails = ["c3@mail.com", "unknown@mail.com", "c0@mail.com", "c3@mail.com"]
+
+    resolved = async_access.run(
+        async_access.resolve_client_emails(emails, batch_size=1)
+    )
+
+    assert list(resolved) == ["c3@mail.com", "unknown@mail.com", "c0@mail.com"]
+    assert resolved["c3@mail.com"].full_name == "Client 3"
+    assert resolved["c0@mail.com"].full_name == "Client 0"
+    assert resolved["unknown@mail.com"] is None
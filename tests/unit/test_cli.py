@@ -0,0 +1,89 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+
+from cli import LAZY_COMMANDS, cli
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+# Cold `import cli` must stay well below the cost of importing the controllers
+# (around 600ms), which is what every invocation paid before lazy loading.
+IMPORT_TIME_BUDGET_MS = 150
+
+HEAVY_MODULES = (
+    "sqlalchemy",
+    "argon2",
+    "jwt",
+    "sentry_sdk",
+    "psycopg2",
+    "controllers",
+    "models",
+)
+
+
+def run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def loaded_heavy_modules(code):
+    result = run_python(
+        "-c",
+        f"import sys\n{code}\n"
+        f"sys.stderr.write(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+    )
+    return result.stderr.split()
+
+
+def test_import_cli_does_not_load_controllers():
+    assert loaded_heavy_modules("import cli") == []
+
+
+def test_help_does_not_load_controllers():
+    code = "import cli\ntry:\n    cli.cli(['--help'])\nexcept SystemExit:\n    pass"
+    assert loaded_heavy_modules(code) == []
+
+
+def test_import_cli_time_budget():
+    result = run_python("-X", "importtime", "-c", "import cli")
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "cli":
+            cumulative_us = int(fields[1])
+    assert cumulative_us is not None
+    assert cumulative_us / 1000 < IMPORT_TIME_BUDGET_MS
+
+
+def test_command_modules_configure_mappers():
+    """Each command module must work when imported alone."""
+    for module_name in {module_name for module_name, _, _ in LAZY_COMMANDS.values()}:
+        run_python(
+            "-c",
+            f"import {module_name}\n"
+            "from sqlalchemy.orm import configure_mappers\n"
+            "configure_mappers()",
+        )
+
+
+def test_lazy_commands_resolve():
+    ctx = click.Context(cli)
+    for name in LAZY_COMMANDS:
+        command = cli.get_command(ctx, name)
+        assert isinstance(command, click.Command)
+        assert command.name == name
+
+
+def test_help_lists_lazy_commands(runner):
+    result = runner.invoke(cli, ["--help"])
+
+    assert result.exit_code == 0
+    for name in LAZY_COMMANDS:
+        assert name in result.output
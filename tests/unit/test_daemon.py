@@ -0,0 +1,89 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+import daemon_client
+from cli import cli
+from daemon import CommandServer
+
+
+@pytest.fixture
+def command_server(tmp_path, monkeypatch):
+    monkeypatch.setenv("EPICEVENT_SOCKET", str(tmp_path / "epicevent.sock"))
+    server = CommandServer(daemon_client.socket_path(), cli)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_connect_without_daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("EPICEVENT_SOCKET", str(tmp_path / "epicevent.sock"))
+
+    assert daemon_client.connect() is None
+
+
+def test_forward_command(command_server, capsys):
+    with patch("controllers.collaborator_controller.util.get_token") as mock_token:
+        mock_token.side_effect = ValueError("Token expired. Please log in again.")
+        with daemon_client.connect() as sock:
+            status = daemon_client.forward(sock, ["get-clients"])
+
+    assert status == 0
+    assert "Token expired. Please log in again." in capsys.readouterr().out
+
+
+def test_forward_exit_status(command_server, capsys):
+    with daemon_client.connect() as sock:
+        status = daemon_client.forward(sock, ["unknown-command"])
+
+    assert status == 2
+    assert "No such command 'unknown-command'" in capsys.readouterr().err
+
+
+def test_main_runs_local_commands_in_process(command_server, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["epicevent", "logout"])
+    with patch("daemon_client.forward") as mock_forward, patch(
+        "controllers.collaborator_controller.util.delete_token"
+    ):
+        with pytest.raises(SystemExit) as e:
+            daemon_client.main()
+
+    assert e.value.code == 0
+    mock_forward.assert_not_called()
+
+
+def test_forward_prompting_command_refused(command_server, capsys):
+    with patch("controllers.client_controller.util.ask_for_input") as mock_input:
+        with daemon_client.connect() as sock:
+            status = daemon_client.forward(sock, ["create-client"])
+
+    assert status == 2
+    assert "run it without the daemon" in capsys.readouterr().err
+    mock_input.assert_not_called()
+
+
+def test_main_runs_prompting_commands_in_process(command_server, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["epicevent", "create-client"])
+    with patch("daemon_client.forward") as mock_forward, patch(
+        "controllers.client_controller.util.get_token"
+    ) as mock_token:
+        mock_token.side_effect = ValueError("Token expired. Please log in again.")
+        with pytest.raises(SystemExit) as e:
+            daemon_client.main()
+
+    assert e.value.code == 0
+    mock_forward.assert_not_called()
+
+
+def test_runs_locally():
+    assert daemon_client.runs_locally(["login"])
+    assert daemon_client.runs_locally(["delete-collaborator"])
+    assert daemon_client.runs_locally(["update-client"])
+    assert not daemon_client.runs_locally(
+        ["update-client", "--id", "1", "--company", "A"]
+    )
+    assert not daemon_client.runs_locally(["get-clients", "--limit", "5"])
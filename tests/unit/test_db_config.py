@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool
+
+import db_config
+from db_config import async_engine_options, engine_options
+
+
+@pytest.fixture
+def fresh_engine(monkeypatch):
+    """Start without engine, and dispose of the ones created by the test."""
+    monkeypatch.setattr(db_config, "_engine", None)
+    monkeypatch.setattr(db_config, "_async_engine", None)
+    monkeypatch.setattr(db_config, "_long_lived", False)
+    yield
+    if db_config._engine is not None:
+        db_config._engine.dispose()
+
+
+def test_engine_options_cli_defaults(monkeypatch):
+    for name in (
+        "DB_POOL_MODE",
+        "DB_POOL_SIZE",
+        "DB_POOL_PRE_PING",
+        "DB_STATEMENT_TIMEOUT",
+    ):
+        monkeypatch.delenv(name, raising=False)
+
+    options = engine_options()
+
+    assert options["pool_size"] == 1
+    assert options["pool_pre_ping"] is False
+    assert "connect_args" not in options
+    assert engine_options(long_lived=True)["pool_size"] == 5
+    assert engine_options(long_lived=True)["pool_pre_ping"] is True
+
+
+def test_engine_options_from_environment(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT", "5000")
+
+    options = engine_options(long_lived=True)
+
+    assert (options["pool_size"], options["max_overflow"]) == (20, 0)
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+
+def test_engine_options_pgbouncer(monkeypatch):
+    monkeypatch.setenv("DB_POOL_MODE", "pgbouncer")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT", "5000")
+
+    options = engine_options()
+
+    assert options["poolclass"] is NullPool
+    # PgBouncer refuses the startup options
+    assert "connect_args" not in options
+
+
+def test_async_engine_options(monkeypatch):
+    monkeypatch.setenv("DB_POOL_MODE", "queue")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT", "5000")
+
+    options = async_engine_options()
+
+    assert options["pool_size"] == 3
+    assert options["connect_args"] == {
+        "server_settings": {"statement_timeout": "5000"}
+    }
+
+    monkeypatch.setenv("DB_POOL_MODE", "pgbouncer")
+    options = async_engine_options()
+
+    assert options["poolclass"] is NullPool
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
+    name = options["connect_args"]["prepared_statement_name_func"]
+    assert name() != name()
+
+
+def test_engine_options_invalid(monkeypatch):
+    monkeypatch.setenv("DB_POOL_MODE", "shared")
+    with pytest.raises(ValueError, match="DB_POOL_MODE must be one of"):
+        engine_options()
+
+    monkeypatch.setenv("DB_POOL_MODE", "queue")
+    monkeypatch.setenv("DB_POOL_SIZE", "many")
+    with pytest.raises(ValueError, match="Invalid DB_POOL_SIZE: 'many'."):
+        engine_options()
+
+
+def test_get_engine_is_lazy(monkeypatch, fresh_engine):
+    monkeypatch.delenv("DB_POOL_MODE", raising=False)
+    assert db_config._engine is None
+
+    engine = db_config.get_engine()
+
+    assert db_config.get_engine() is engine
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 1
+
+    db_config.use_long_lived_engine()
+
+    assert db_config.get_engine() is not engine
+    assert db_config.get_engine().pool.size() == 5
+
+
+def test_get_async_engine_is_lazy(monkeypatch, fresh_engine):
+    monkeypatch.delenv("DB_POOL_MODE", raising=False)
+
+    engine = db_config.get_async_engine()
+
+    assert db_config.get_async_engine() is engine
+    assert engine.pool.size() == 1
+
+    db_config.use_long_lived_engine()
+
+    assert db_config.get_async_engine().pool.size() == 5
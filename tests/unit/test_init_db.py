@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+from click.testing import CliRunner
+from sqlalchemy import inspect, text
+
+from init_db import (
+    MIN_MEMORY_COST,
+    MIN_TIME_COST,
+    add_version_columns,
+    calibrate_hash,
+    calibrate_hasher,
+    create_indexes,
+    drop_replaced_indexes,
+)
+from utils.util import get_password_hasher
+
+
+def index_names(engine, table):
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def column_names(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def test_create_indexes_restores_missing_indexes(test_db):
+    """Test that the declared indexes are created on existing tables."""
+    with test_db.begin() as conn:
+        conn.execute(text("DROP INDEX ix_event_unassigned_start_date_id"))
+    assert "ix_event_unassigned_start_date_id" not in index_names(test_db, "event")
+
+    create_indexes(test_db)
+    create_indexes(test_db)
+
+    assert "ix_event_unassigned_start_date_id" in index_names(test_db, "event")
+    assert {
+        "ix_contract_client_id",
+        "ix_contract_status_id",
+        "ix_contract_sales_contact_id_id",
+        "ix_contract_unpaid_id",
+    } <= index_names(test_db, "contract")
+
+
+def test_drop_replaced_indexes(test_db):
+    """Test that the GIN search index is replaced by the GiST one."""
+    with test_db.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE INDEX ix_client_search_trgm ON client "
+                "USING gin (full_name gin_trgm_ops)"
+            )
+        )
+
+    drop_replaced_indexes(test_db)
+    drop_replaced_indexes(test_db)
+
+    names = index_names(test_db, "client")
+    assert "ix_client_search_trgm" not in names
+    assert "ix_client_search_gist_trgm" in names
+
+
+def test_add_version_columns_to_existing_tables(test_db):
+    """Test that the version column is added to tables created before it."""
+    with test_db.begin() as conn:
+        conn.execute(text("ALTER TABLE client DROP COLUMN version_id"))
+    assert "version_id" not in column_names(test_db, "client")
+
+    add_version_columns(test_db)
+    add_version_columns(test_db)
+
+    assert all(
+        "version_id" in column_names(test_db, table)
+        for table in ("client", "collaborator", "contract", "event")
+    )
+
+
+def test_calibrate_hasher():
+    """Test that the cost stays within the target, down to the minimum."""
+    hasher, duration = calibrate_hasher(0.0, 4 * MIN_MEMORY_COST, 1)
+
+    assert hasher.time_cost == MIN_TIME_COST
+    assert hasher.memory_cost == MIN_MEMORY_COST
+
+    hasher, duration = calibrate_hasher(0.2, MIN_MEMORY_COST, 1)
+
+    assert hasher.time_cost > MIN_TIME_COST
+    assert duration <= 0.2
+
+
+def test_calibrate_hash_saves_parameters(monkeypatch):
+    """Test that the parameters are written and used by the next hashes."""
+    for name in ("ARGON2_TIME_COST", "ARGON2_MEMORY_COST", "ARGON2_PARALLELISM"):
+        monkeypatch.delenv(name, raising=False)
+
+    with patch("init_db.write_env_variable") as write_env_variable:
+        result = CliRunner().invoke(
+            calibrate_hash, ["--target-ms", "1", "--memory", "19", "--save"]
+        )
+
+    try:
+        assert result.exit_code == 0
+        write_env_variable.assert_any_call("ARGON2_MEMORY_COST", str(MIN_MEMORY_COST))
+        assert get_password_hasher().memory_cost == MIN_MEMORY_COST
+    finally:
+        get_password_hasher.cache_clear()
@@ -0,0 +1,145 @@
+import itertools
+from unittest.mock import patch
+
+import click
+import pytest
+
+from utils.permissions import (
+    ActionType,
+    FilterPermissionManager,
+    PERMISSIONS_VERSION,
+    PermissionManager,
+    ResourceType,
+    RoleType,
+    check_filters,
+    get_auth_context,
+    login_required,
+    permission,
+    permission_claims,
+)
+
+
+@click.command()
+@click.option("--assigned", is_flag=True)
+@permission(ActionType.READ, resource=ResourceType.CLIENT)
+@check_filters(ResourceType.CLIENT, "assigned")
+@login_required(pass_token=True)
+def decorated_command(token, assigned):
+    click.echo(f"{token['id']} {get_auth_context().role.value}")
+
+
+def test_token_decoded_once_per_command(runner):
+    with patch(
+        "utils.permissions.util.get_token",
+        return_value={"role": "sales", "id": 4},
+    ) as mock_get_token:
+        result = runner.invoke(decorated_command, ["--assigned"])
+        assert result.output == "4 sales\n"
+        mock_get_token.assert_called_once()
+
+        runner.invoke(decorated_command, ["--assigned"])
+        assert mock_get_token.call_count == 2
+
+
+def test_auth_context_without_click_context():
+    with patch(
+        "utils.permissions.util.get_token",
+        return_value={"role": "support", "id": 2},
+    ):
+        auth = get_auth_context()
+
+    assert auth.id == 2
+    assert auth.role == RoleType.SUPPORT
+
+
+def test_auth_context_invalid_token(runner):
+    with patch(
+        "utils.permissions.util.get_token",
+        return_value={"role": "sales"},
+    ):
+        with pytest.raises(ValueError) as e:
+            get_auth_context()
+        assert str(e.value) == "No id stocked in the current token. Try to log again."
+
+        result = runner.invoke(decorated_command)
+        assert result.output == (
+            "No id stocked in the current token. Try to log again.\n"
+        )
+
+
+def test_has_permission_matches_tables():
+    for role, action, resource in itertools.product(RoleType, ActionType, ResourceType):
+        expected = resource in PermissionManager.BASE_PERMISSIONS[
+            action
+        ] or resource in PermissionManager.PERMISSIONS[role].get(action, [])
+        assert PermissionManager.has_permission(role, action, resource) == expected
+
+
+def test_permission_masks_match_tables():
+    for role, action, resource in itertools.product(RoleType, ActionType, ResourceType):
+        mask = PermissionManager.mask(action, resource=resource)
+        assert bool(PermissionManager.MASKS[role] & mask) == (
+            PermissionManager.has_permission(role, action, resource)
+        )
+
+
+def test_decorators_use_token_claims(runner):
+    """Test that the claims of the token authorise, not the role."""
+    claims = {**permission_claims(RoleType.SUPPORT), "role": "sales", "id": 4}
+    with patch("utils.permissions.util.get_token", return_value=claims):
+        result = runner.invoke(decorated_command)
+        assert result.output == "4 sales\n"
+
+        result = runner.invoke(decorated_command, ["--assigned"])
+        assert "does not have permission to use filter '--assigned'" in result.output
+
+    claims["perm"] = 0
+    with patch("utils.permissions.util.get_token", return_value=claims):
+        result = runner.invoke(decorated_command)
+        assert result.output == (
+            "You do not have permission to perform READ on CLIENT.\n"
+        )
+
+
+def test_outdated_token_claims_use_role(runner):
+    """Test that claims of other tables are computed again from the role."""
+    token = {"role": "sales", "id": 4, "perm_v": "outdated", "perm": 0, "filters": 0}
+    with patch("utils.permissions.util.get_token", return_value=token):
+        auth = get_auth_context()
+        result = runner.invoke(decorated_command, ["--assigned"])
+
+    assert PERMISSIONS_VERSION != "outdated"
+    assert auth.permissions == PermissionManager.MASKS[RoleType.SALES]
+    assert auth.filters == FilterPermissionManager.MASKS[RoleType.SALES]
+    assert result.output == "4 sales\n"
+
+
+def test_has_permission_unknown_role():
+    with pytest.raises(KeyError) as e:
+        PermissionManager.has_permission("admin", ActionType.READ, ResourceType.EVENT)
+    assert e.value.args[0] == "Role admin not found"
+
+
+def test_permission_tables_are_frozen():
+    with pytest.raises(TypeError):
+        PermissionManager.ALLOWED[RoleType.SUPPORT] = frozenset()
+
+
+def test_can_use_filter():
+    can_use_filter = FilterPermissionManager.can_use_filter
+
+    assert can_use_filter(RoleType.SALES, ResourceType.CONTRACT, "status", "signed")
+    assert can_use_filter(RoleType.SALES, ResourceType.CONTRACT, "assigned", True)
+    assert can_use_filter(RoleType.SALES, ResourceType.CONTRACT, "status", None)
+    assert not can_use_filter(RoleType.SALES, ResourceType.CONTRACT, "status", "x")
+    assert not can_use_filter(RoleType.SUPPORT, ResourceType.EVENT, "assign", True)
+    assert can_use_filter(RoleType.SUPPORT, ResourceType.EVENT, "assign", "assigned")
+    assert not can_use_filter(
+        RoleType.SUPPORT, ResourceType.EVENT, "assign", "no-contact"
+    )
+    assert can_use_filter(RoleType.MANAGEMENT, ResourceType.CLIENT, "assigned", False)
+    assert not can_use_filter(
+        RoleType.MANAGEMENT, ResourceType.CLIENT, "assigned", True
+    )
+    # a role missing from the table, e.g. from an old token, is refused
+    assert not can_use_filter("unknown", ResourceType.CONTRACT, "status", "signed")
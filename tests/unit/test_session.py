@@ -0,0 +1,53 @@
+import os
+import stat
+
+from utils import session
+
+
+def test_session_path(monkeypatch, tmp_path):
+    monkeypatch.delenv("EPICEVENT_SESSION")
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    path = session.session_path()
+
+    assert path.startswith(str(tmp_path / ".epicevent" / "session-"))
+
+
+def test_write_and_read_session(session_file):
+    assert session.read_session() == {}
+
+    session.write_session({"token": "first"})
+
+    assert session.read_session() == {"token": "first"}
+    assert stat.S_IMODE(os.stat(session_file).st_mode) == 0o600
+    # no temporary file left next to the session
+    assert os.listdir(session_file.parent) == [session_file.name]
+
+    session.clear_session()
+    session.clear_session()
+
+    assert session.read_session() == {}
+
+
+def test_read_session_cached_until_replaced(session_file, mocker):
+    """Test that the file is parsed again only once replaced."""
+    session.write_session({"token": "first"})
+    spy = mocker.spy(session.json, "load")
+
+    assert session.read_session() == {"token": "first"}
+    assert session.read_session() == {"token": "first"}
+    assert spy.call_count == 1
+
+    # login from another terminal, within the same mtime tick or not
+    other = session_file.with_name("other.json")
+    other.write_text('{"token": "second"}')
+    os.replace(other, session_file)
+
+    assert session.read_session() == {"token": "second"}
+    assert spy.call_count == 2
+
+
+def test_read_session_invalid_file(session_file):
+    session_file.write_text("{not json")
+
+    assert session.read_session() == {}
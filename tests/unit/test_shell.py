@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+from cli import cli
+
+
+def test_shell_runs_commands_in_process(runner):
+    with patch("shell.warm_up") as mock_warm_up, patch(
+        "controllers.collaborator_controller.util.delete_token"
+    ) as mock_delete_token:
+        result = runner.invoke(cli, ["shell"], input="logout\nlogout\nexit\n")
+
+        assert result.exit_code == 0
+        mock_warm_up.assert_called_once()
+        assert mock_delete_token.call_count == 2
+        assert result.output.count("Logout successful.") == 2
+
+
+def test_shell_survives_errors(runner):
+    with patch("shell.warm_up"):
+        result = runner.invoke(
+            cli, ["shell"], input="unknown-command\n'\nshell\nexit\n"
+        )
+
+        assert result.exit_code == 0
+        assert "No such command 'unknown-command'" in result.output
+        assert "No closing quotation" in result.output
+        assert "Already in the shell." in result.output
+
+
+def test_shell_help(runner):
+    with patch("shell.warm_up"):
+        result = runner.invoke(cli, ["shell"], input="help\nquit\n")
+
+        assert result.exit_code == 0
+        assert "get-clients" in result.output
@@ -1,4 +1,4 @@
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, time, timezone, timedelta
 from unittest.mock import mock_open, MagicMock
 
 import argon2
@@ -6,15 +6,21 @@ import jwt
 import pytest
 from argon2 import PasswordHasher
 from jwt import ExpiredSignatureError
+from sqlalchemy import select
 
-from utils.permissions import RoleType
+from models.revoked_token import RevokedToken
+from utils import session
+from utils.permissions import PERMISSIONS_VERSION, PermissionManager, RoleType
 from utils.util import (
+    get_password_hasher,
+    needs_rehash,
     verify_password,
     hash_password,
     ask_for_input,
     ask_for_password,
     write_env_variable,
     create_token,
+    delete_token,
     get_token,
     choose_from_enum,
 )
@@ -23,6 +29,14 @@ from validator import (
     validate_email,
     validate_phone_number,
     validate_password,
+    validate_date,
+    validate_time,
+    validate_columns,
+    optional,
+    parse_date,
+    parse_digit,
+    parse_email,
+    parse_time,
 )
 
 
@@ -53,6 +67,26 @@ def test_verify_password_invalid():
     assert str(e.value) == "The password does not match the supplied hash"
 
 
+def test_password_hasher_from_environment(monkeypatch):
+    old_hash = hash_password("azerty123")
+    monkeypatch.setenv("ARGON2_TIME_COST", "2")
+    monkeypatch.setenv("ARGON2_MEMORY_COST", "19456")
+    monkeypatch.setenv("ARGON2_PARALLELISM", "1")
+    get_password_hasher.cache_clear()
+    try:
+        hasher = get_password_hasher()
+        assert get_password_hasher() is hasher
+        assert hasher.time_cost == 2
+        assert hasher.memory_cost == 19456
+        assert hasher.parallelism == 1
+
+        assert needs_rehash(old_hash) is True
+        assert needs_rehash(hash_password("azerty123")) is False
+        assert verify_password("azerty123", old_hash) is True
+    finally:
+        get_password_hasher.cache_clear()
+
+
 def test_validate_email():
     email = "test@est.com"
     assert validate_email(email) is True
@@ -143,6 +177,63 @@ def test_validate_password_invalid():
     )
 
 
+def test_validate_date():
+    assert validate_date("2025-06-01") is True
+    assert parse_date("2025-06-01") == date(2025, 6, 1)
+    # as typed at the prompts
+    assert parse_date("2025-6-1") == date(2025, 6, 1)
+
+
+def test_validate_date_invalid():
+    for value in ("20250601", "2025-02-30", "01/06/2025"):
+        with pytest.raises(ValueError) as e:
+            validate_date(value)
+        assert str(e.value) == "Your date must be yyyy-mm-dd."
+
+
+def test_validate_time():
+    assert validate_time("09:30") is True
+    assert parse_time("09:30") == time(9, 30)
+    assert parse_time("9:30") == time(9, 30)
+
+
+def test_validate_time_invalid():
+    for value in ("0930", "09:30:00", "24:00"):
+        with pytest.raises(ValueError) as e:
+            validate_time(value)
+        assert str(e.value) == "Your time must be HH:MM."
+
+
+def test_validate_columns():
+    report = validate_columns(
+        {
+            "email": ["a@test.com", "a@test", None],
+            "start_date": ["2025-06-01", "2025-06-31", "2025-06-02"],
+            "support_contact_id": [None, "2", "x"],
+        },
+        {
+            "email": parse_email,
+            "start_date": parse_date,
+            "support_contact_id": optional(parse_digit),
+        },
+    )
+
+    assert report.values["start_date"] == [date(2025, 6, 1), None, date(2025, 6, 2)]
+    assert report.values["support_contact_id"] == [None, 2, None]
+    assert report.errors == {
+        1: ["Invalid email address.", "Your date must be yyyy-mm-dd."],
+        2: ["Missing email.", "You must enter a number."],
+    }
+    assert list(report.rows())[0] == (
+        0,
+        {
+            "email": "a@test.com",
+            "start_date": date(2025, 6, 1),
+            "support_contact_id": None,
+        },
+    )
+
+
 def test_ask_for_input(mocker):
     mock_input = mocker.patch("views.view.get_input", return_value="name")
     result = ask_for_input("Enter input")
@@ -283,10 +374,7 @@ def test_create_token(mocker):
     collaborator.first_name = "bob"
     collaborator.name = "bob"
 
-    collaborator.role = MagicMock()
-    collaborator.role.name = RoleType.MANAGEMENT.value
-
-    mock_write = mocker.patch("utils.util.write_env_variable")
+    collaborator.role = RoleType.MANAGEMENT
 
     token = create_token(collaborator)
 
@@ -294,9 +382,27 @@ def test_create_token(mocker):
     assert payload["first_name"] == "bob"
     assert payload["name"] == "bob"
     assert payload["role"] == RoleType.MANAGEMENT.value
+    assert payload["perm"] == PermissionManager.MASKS[RoleType.MANAGEMENT]
+    assert payload["perm_v"] == PERMISSIONS_VERSION
     assert "exp" in payload
 
-    mock_write.assert_called_once_with("TOKEN", token)
+    assert session.read_session()["token"] == token
+    assert get_token()["first_name"] == "bob"
+    refresh_payload = jwt.decode(
+        session.read_session()["refresh_token"], secret_key, algorithms=["HS256"]
+    )
+    assert refresh_payload["type"] == "refresh"
+    assert refresh_payload["id"] == 123
+
+
+def test_delete_token(mocker):
+    mocker.patch("utils.util.SECRET_KEY", "secret_key")
+    session.write_session({"token": "token"})
+
+    delete_token()
+    delete_token()
+
+    assert session.read_session() == {}
 
 
 def test_create_token_invalid(mocker):
@@ -322,7 +428,7 @@ def test_get_token(mocker):
     }
 
     fake_token = jwt.encode(payload, secret_key, algorithm="HS256")
-    mocker.patch("utils.util.TOKEN", fake_token)
+    session.write_session({"token": fake_token})
 
     token = get_token()
 
@@ -353,7 +459,7 @@ def test_get_token_expired(mocker):
     }
 
     fake_token = jwt.encode(payload, secret_key, algorithm="HS256")
-    mocker.patch("utils.util.TOKEN", fake_token)
+    session.write_session({"token": fake_token})
 
     with pytest.raises(ExpiredSignatureError) as e:
         token = get_token()
@@ -402,3 +508,97 @@ def test_out_of_range_choose_from_enum(mocker):
     assert mock_input.call_count == 2
 
     mock_display_error.assert_called_once()
+
+
+def expire_access_token(secret_key):
+    """Replace the access token of the session by an expired one."""
+    data = session.read_session()
+    payload = jwt.decode(data["token"], secret_key, algorithms=["HS256"])
+    payload["exp"] = datetime.now(tz=timezone.utc) - timedelta(minutes=1)
+    session.write_session({**data, "token": jwt.encode(payload, secret_key)})
+
+
+def test_get_token_refreshes_expired_token(mocker, db_session, sales_user):
+    mocker.patch("utils.util.SECRET_KEY", "secret_key")
+    mocker.patch("utils.util.Session", return_value=db_session)
+    create_token(sales_user)
+    expire_access_token("secret_key")
+    refresh_token = session.read_session()["refresh_token"]
+    # the new access token carries the current role
+    sales_user.role = RoleType.SUPPORT
+    db_session.commit()
+
+    token = get_token()
+
+    assert token["id"] == sales_user.id
+    assert token["role"] == "support"
+    assert session.read_session()["refresh_token"] == refresh_token
+    assert get_token() == token
+
+
+def test_get_token_revoked_refresh_token(mocker, db_session, sales_user):
+    mocker.patch("utils.util.SECRET_KEY", "secret_key")
+    mocker.patch("utils.util.Session", return_value=db_session)
+    create_token(sales_user)
+    data = session.read_session()
+
+    delete_token()
+    session.write_session(data)
+    expire_access_token("secret_key")
+
+    with pytest.raises(ExpiredSignatureError, match="Session revoked"):
+        get_token()
+    assert session.read_session() == {}
+
+
+def test_get_token_expired_refresh_token(mocker):
+    mocker.patch("utils.util.SECRET_KEY", "secret_key")
+    expired = datetime.now(tz=timezone.utc) - timedelta(minutes=1)
+    session.write_session(
+        {
+            "token": jwt.encode({"id": 1, "exp": expired}, "secret_key"),
+            "refresh_token": jwt.encode(
+                {"type": "refresh", "id": 1, "jti": "jti", "exp": expired},
+                "secret_key",
+            ),
+        }
+    )
+
+    with pytest.raises(ExpiredSignatureError, match="Session expired"):
+        get_token()
+
+
+def test_delete_token_purges_expired_revocations(mocker, db_session, sales_user):
+    mocker.patch("utils.util.SECRET_KEY", "secret_key")
+    mocker.patch("utils.util.Session", return_value=db_session)
+    expired = datetime.now(tz=timezone.utc) - timedelta(days=1)
+    db_session.add(RevokedToken("expired", expired))
+    db_session.commit()
+    create_token(sales_user)
+    refresh_payload = jwt.decode(
+        session.read_session()["refresh_token"], "secret_key", algorithms=["HS256"]
+    )
+
+    delete_token()
+
+    assert db_session.scalars(select(RevokedToken.jti)).all() == [
+        refresh_payload["jti"]
+    ]
+
+
+def test_get_token_decodes_once(mocker):
+    secret_key = "secret_key"
+    mocker.patch("utils.util.SECRET_KEY", secret_key)
+    payload = {
+        "id": 1,
+        "role": "management",
+        "exp": datetime.now(tz=timezone.utc) + timedelta(minutes=15),
+    }
+    fake_token = jwt.encode(payload, secret_key, algorithm="HS256")
+    session.write_session({"token": fake_token})
+    mock_decode = mocker.spy(jwt, "decode")
+
+    assert get_token()["id"] == 1
+    assert get_token()["id"] == 1
+
+    mock_decode.assert_called_once()
@@ -0,0 +1,231 @@
+import contextlib
+import csv
+import functools
+import io
+import itertools
+import json
+import operator
+import os
+import sys
+
+import click
+from sqlalchemy.exc import DBAPIError
+
+import validator
+from views import view
+
+FILE_FORMATS = ("csv", "ndjson")
+
+# rows validated and copied to the staging table at once
+BATCH_SIZE = 10000
+
+
+def guess_format(path):
+    """Format of an import file from its extension, csv by default."""
+    extension = os.path.splitext(path)[1].lower()
+    return "ndjson" if extension in (".ndjson", ".jsonl", ".json") else "csv"
+
+
+def rejects_path_of(path):
+    root, _ = os.path.splitext(path)
+    return f"{root}.rejects.csv"
+
+
+def read_rows(path, file_format):
+    """Stream the rows of a CSV file with a header line or of an NDJSON file,
+    as (line number, row) pairs. A row which can't be parsed is None."""
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+
+def batches(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+def column_parsers(model, parsers):
+    """The parsers of the fields, those of the string columns of the model
+    checking the length of the values first: a value too long for its column
+    would make the database refuse the whole import, not just its row."""
+    columns = model.__table__.c
+    checked = {}
+    for field, parse in parsers.items():
+        length = getattr(columns[field].type, "length", None)
+        if length is not None:
+            parse = validator.max_length(field, length, parse)
+        checked[field] = parse
+    return checked
+
+
+def clean_row(row, fields):
+    """Values of the fields in the row as stripped strings, None when missing."""
+    values = {}
+    for field in fields:
+        value = row.get(field)
+        values[field] = None if value is None else str(value).strip() or None
+    return values
+
+
+def valid_rows(rows, fields, parsers, rejects):
+    """Yield the (line, values) pairs of the rows whose fields are valid, with
+    the typed values of the parsed fields, write the others to the rejects.
+
+    The rows are validated by batches, column by column, see
+    validator.validate_columns."""
+    for batch in batches(rows):
+        lines, cleaned = [], []
+        for line, row in batch:
+            if row is None:
+                rejects.write(line, ["Malformed line."], None)
+                continue
+            lines.append(line)
+            cleaned.append(clean_row(row, fields))
+        columns = {field: [values[field] for values in cleaned] for field in fields}
+        report = validator.validate_columns(columns, parsers)
+        for index, typed in report.rows():
+            if index in report.errors:
+                rejects.write(lines[index], report.errors[index], cleaned[index])
+                continue
+            yield lines[index], {**cleaned[index], **typed}
+
+
+def load(session, rows, check_batch, table, columns):
+    """Copy the rows to the table by batches and return how many were loaded.
+
+    check_batch receives each batch of (line, values) pairs and returns the
+    tuples of the columns to load, the references of a whole batch being
+    checked with one query per referenced table instead of one per row."""
+    cursor = raw_cursor(session)
+    loaded = 0
+    for batch in batches(rows):
+        valid = check_batch(batch)
+        copy_rows(cursor, table, columns, valid)
+        loaded += len(valid)
+    return loaded
+
+
+def raw_cursor(session):
+    """psycopg2 cursor of the session's connection, to use COPY."""
+    return session.connection().connection.driver_connection.cursor()
+
+
+def copy_value(value):
+    """A value of the COPY data: quoted, unless it is None. A quoted value is
+    never read as NULL, whatever its text, an unquoted empty one always is."""
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Load the rows into the table with COPY, through an in-memory CSV."""
+    if not rows:
+        return
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(map(copy_value, row)))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+class RejectWriter:
+    """CSV file of the rejected rows with their line and errors, sorted by
+    line, written on exit if any row was rejected.
+
+    Rows are rejected batch by batch, by the validation then by the checks
+    against the database, out of the order of the file: they are kept until
+    the end of the import to be sorted."""
+
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = fields
+        self.rows = []
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.rows:
+            return
+        self.rows.sort(key=operator.itemgetter(0))
+        with open(self.path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["line", "errors", *self.fields])
+            writer.writerows(self.rows)
+
+    def write(self, line, errors, row):
+        row = row or {}
+        self.rows.append(
+            [line, " ".join(errors), *(row.get(field) for field in self.fields)]
+        )
+
+
+@contextlib.contextmanager
+def failing_import():
+    """Report an import refused by the database, rolled back as a whole, and
+    exit with status 1 instead of printing the failed statement."""
+    try:
+        yield
+    except DBAPIError as e:
+        view.display_error(f"Import failed, nothing was imported: {e.orig}".strip())
+        sys.exit(1)
+
+
+def import_options(func):
+    """Add the FILE argument and the --format and --rejects options to an
+    import command, passed to it resolved as file, file_format and
+    rejects_path."""
+
+    @click.argument("file", type=click.Path(exists=True, dir_okay=False))
+    @click.option(
+        "--format",
+        "file_format",
+        type=click.Choice(FILE_FORMATS),
+        default=None,
+        help="Format of the file, guessed from its extension by default.",
+    )
+    @click.option(
+        "--rejects",
+        "rejects_path",
+        type=click.Path(dir_okay=False),
+        default=None,
+        help="CSV file listing the rejected rows and why, FILE.rejects.csv by "
+        "default.",
+    )
+    @functools.wraps(func)
+    def wrapper(*args, file, file_format, rejects_path, **kwargs):
+        return func(
+            *args,
+            file=file,
+            file_format=file_format or guess_format(file),
+            rejects_path=rejects_path or rejects_path_of(file),
+            **kwargs,
+        )
+
+    return wrapper
+
+
+def display_summary(loaded, name, rejects):
+    view.display_message(f"{loaded} {name} imported.", "green")
+    if rejects.count:
+        view.display_error(f"{rejects.count} rows rejected, see {rejects.path}.")
@@ -0,0 +1,199 @@
+import functools
+import operator
+
+import click
+from sqlalchemy import inspect, select, tuple_
+
+from utils import output
+from views import view
+
+SORT_ORDERS = ("asc", "desc")
+
+# number of rows fetched at once from the server-side cursor when streaming
+STREAM_BATCH_SIZE = 1000
+
+# columns never listed: the version of the rows only serves the optimistic
+# concurrency control of the edits
+HIDDEN_FIELDS = frozenset({"version_id"})
+
+
+def model_fields(model):
+    """Names of the columns of the model which can be listed."""
+    return [
+        name for name in inspect(model).column_attrs.keys() if name not in HIDDEN_FIELDS
+    ]
+
+
+def check_fields(fields, model):
+    """Raise a usage error on a field which isn't a column of the model."""
+    choices = model_fields(model)
+    unknown = [field for field in fields if field not in choices]
+    if unknown:
+        raise click.BadParameter(
+            f"Unknown field {unknown[0]}. Choose from: {', '.join(choices)}.",
+            param_hint="'--fields'",
+        )
+
+
+def parse_fields(value):
+    if not value:
+        return None
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+class ListingOptions:
+    """Page of a listing: at most `limit` rows, after the row of id `after`
+    in the `sort` order of the primary key. Streamed listings are read from a
+    server-side cursor instead of being buffered in memory.
+
+    Listings are printed as text by default. The other output formats only
+    select the requested `fields` columns instead of whole entities."""
+
+    def __init__(
+        self,
+        limit=None,
+        after=None,
+        sort="asc",
+        stream=False,
+        output_format="text",
+        fields=None,
+    ):
+        self.limit = limit
+        self.after = after
+        self.sort = sort
+        self.stream = stream
+        self.output_format = output_format
+        self.fields = fields
+        # reads the id of a fetched row, whose position depends on the fields
+        self.row_id = operator.attrgetter("id")
+
+    @property
+    def projected(self):
+        return self.output_format != "text"
+
+    def select(self, model, *options):
+        """Select the entities of the model, loaded with the given options, or
+        only the columns of the requested fields. The id is always selected
+        since the next page starts after the last one."""
+        if not self.projected:
+            return select(model).options(*options)
+        if self.fields is None:
+            self.fields = model_fields(model)
+        selected = self.fields if "id" in self.fields else [*self.fields, "id"]
+        self.row_id = operator.itemgetter(selected.index("id"))
+        return select(*(getattr(model, field) for field in selected))
+
+    def apply(self, stmt, key, order=None):
+        """Seek past `after` on the key instead of using an offset, so that any
+        page is an index range scan costing the same as the first one.
+
+        Rows can be ordered by another column first, the key breaking the ties:
+        the page then starts after the position of the `after` row."""
+        descending = self.sort == "desc"
+        columns = [key] if order is None else [order, key]
+        if self.after is not None:
+            if order is None:
+                position, after = key, self.after
+            else:
+                position = tuple_(order, key)
+                after = select(order, key).where(key == self.after).scalar_subquery()
+            stmt = stmt.where(position < after if descending else position > after)
+        stmt = stmt.order_by(
+            *(column.desc() if descending else column.asc() for column in columns)
+        )
+        if self.limit is not None:
+            stmt = stmt.limit(self.limit)
+        return stmt
+
+    def fetch(self, session, stmt):
+        """Execute the statement and return its entities, or its rows when
+        projected. When streaming, rows are fetched by batches as they are
+        iterated, so memory stays flat whatever the size of the table."""
+        if self.stream:
+            stmt = stmt.execution_options(yield_per=STREAM_BATCH_SIZE)
+        result = session.execute(stmt) if self.projected else session.scalars(stmt)
+        return result if self.stream else result.all()
+
+    def next_page(self, count, last_id):
+        """Return the `after` value of the next page, None on the last page."""
+        if self.limit is not None and count == self.limit:
+            return last_id
+        return None
+
+    def display(self, rows, empty_message):
+        """Write the rows as they come in the output format, then how to get
+        the next page. The hint goes to stderr when the output is meant to be
+        parsed."""
+        writer = output.get_writer(self.output_format, self.fields, empty_message)
+        last_id = None
+        for row in rows:
+            last_id = self.row_id(row)
+            writer.write(row)
+        writer.close()
+        if writer.count:
+            after = self.next_page(writer.count, last_id)
+            view.display_next_page(after, err=self.projected)
+
+
+def listing_options(model, stream=False):
+    """Add the --limit, --after, --sort, --stream, --format and --fields
+    options to a list command of the model, passed to it as a single `listing`
+    argument. `stream` is the default mode.
+
+    The options are checked before the command runs, so that a usage error
+    exits with status 2 instead of being reported by the command."""
+
+    def decorator(func):
+        @click.option(
+            "--fields",
+            callback=lambda ctx, param, value: parse_fields(value),
+            help="Comma separated columns to output, all of them by default. "
+            "Requires a --format other than text.",
+        )
+        @click.option(
+            "--format",
+            "output_format",
+            type=click.Choice(output.FORMATS),
+            default="text",
+            help="Output format. json, ndjson and csv only read the selected "
+            "columns.",
+        )
+        @click.option(
+            "--stream/--buffered",
+            default=stream,
+            help="Fetch the results by batches from a server-side cursor "
+            "instead of loading them all in memory.",
+        )
+        @click.option(
+            "--sort",
+            type=click.Choice(SORT_ORDERS),
+            default="asc",
+            help="Return the results in ascending or descending order.",
+        )
+        @click.option(
+            "--after",
+            type=int,
+            default=None,
+            help="Only return results after this id, the last one of the "
+            "previous page.",
+        )
+        @click.option(
+            "--limit",
+            type=click.IntRange(min=1),
+            default=None,
+            help="Maximum number of results.",
+        )
+        @functools.wraps(func)
+        def wrapper(*args, limit, after, sort, stream, output_format, fields, **kwargs):
+            if fields is not None:
+                if output_format == "text":
+                    raise click.UsageError(
+                        "--fields requires --format json, ndjson or csv."
+                    )
+                check_fields(fields, model)
+            listing = ListingOptions(limit, after, sort, stream, output_format, fields)
+            return func(*args, listing=listing, **kwargs)
+
+        return wrapper
+
+    return decorator
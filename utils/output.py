@@ -0,0 +1,126 @@
+import abc
+import csv
+import datetime
+import enum
+import io
+import json
+
+import click
+
+from views import view
+
+FORMATS = ("text", "json", "ndjson", "csv")
+
+# rows written to the buffer before it is flushed to stdout
+FLUSH_SIZE = 500
+
+PLAIN_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def serialize(value):
+    """Convert a column value to a JSON and CSV friendly one."""
+    if type(value) in PLAIN_TYPES:
+        return value
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+class TextWriter:
+    """Print the rows as they are described by their model, one at a time."""
+
+    def __init__(self, fields, empty_message):
+        self.empty_message = empty_message
+        self.count = 0
+
+    def write(self, row):
+        self.count += 1
+        view.display_message(row)
+
+    def close(self):
+        if not self.count:
+            view.display_message(self.empty_message)
+
+
+class BufferedWriter(abc.ABC):
+    """Write rows of the requested fields, selected in that order, to a buffer
+    flushed to stdout every FLUSH_SIZE rows instead of once per row."""
+
+    def __init__(self, fields, empty_message=None):
+        self.fields = fields
+        self.buffer = io.StringIO()
+        self.pending = 0
+        self.count = 0
+
+    def write(self, row):
+        values = [serialize(value) for value in row[: len(self.fields)]]
+        self.write_values(values)
+        self.count += 1
+        self.pending += 1
+        if self.pending >= FLUSH_SIZE:
+            self.flush()
+
+    @abc.abstractmethod
+    def write_values(self, values):
+        """Write the serialized values of a row to the buffer."""
+
+    def flush(self):
+        click.echo(self.buffer.getvalue(), nl=False)
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+
+
+class NDJSONWriter(BufferedWriter):
+    """One JSON object per line."""
+
+    def write_values(self, values):
+        self.buffer.write(json.dumps(dict(zip(self.fields, values))))
+        self.buffer.write("\n")
+
+
+class JSONWriter(BufferedWriter):
+    """A JSON array of objects, written as the rows come."""
+
+    def __init__(self, fields, empty_message=None):
+        super().__init__(fields, empty_message)
+        self.buffer.write("[")
+
+    def write_values(self, values):
+        if self.count:
+            self.buffer.write(",")
+        self.buffer.write("\n")
+        self.buffer.write(json.dumps(dict(zip(self.fields, values))))
+
+    def close(self):
+        self.buffer.write("\n]\n" if self.count else "]\n")
+        super().close()
+
+
+class CSVWriter(BufferedWriter):
+    """A header line followed by one line per row."""
+
+    def __init__(self, fields, empty_message=None):
+        super().__init__(fields, empty_message)
+        self.csv_writer = csv.writer(self.buffer, lineterminator="\n")
+        self.csv_writer.writerow(fields)
+
+    def write_values(self, values):
+        self.csv_writer.writerow(values)
+
+
+WRITERS = {
+    "text": TextWriter,
+    "json": JSONWriter,
+    "ndjson": NDJSONWriter,
+    "csv": CSVWriter,
+}
+
+
+def get_writer(output_format, fields, empty_message):
+    return WRITERS[output_format](fields, empty_message)
@@ -1,7 +1,11 @@
 import enum
 import functools
-from copy import deepcopy
+import hashlib
+import itertools
+import json
+from types import MappingProxyType
 
+import click
 import sentry_sdk
 
 from utils import util
@@ -29,6 +33,48 @@ class ResourceType(enum.Enum):
     COLLABORATOR = "collaborator"
 
 
+def compile_permissions(base_permissions, permissions):
+    """Compile the permission tables into the frozen set of
+    (action, resource) pairs allowed for each role."""
+    return MappingProxyType(
+        {
+            role: frozenset(
+                (action, resource)
+                for table in (base_permissions, role_permissions)
+                for action, resources in table.items()
+                for resource in resources
+            )
+            for role, role_permissions in permissions.items()
+        }
+    )
+
+
+def compile_filter_keys(filter_permissions):
+    """Compile the filter table into the (resource, filter name, value)
+    allowed for each role."""
+    return {
+        role: [
+            (resource, filter_name, value)
+            for resource, filters in resources.items()
+            for filter_name, values in filters.items()
+            for value in values
+        ]
+        for role, resources in filter_permissions.items()
+    }
+
+
+def compile_bits(keys):
+    """Assign a bit to each key, in order."""
+    return MappingProxyType({key: 1 << index for index, key in enumerate(keys)})
+
+
+def compile_masks(allowed_keys, bits):
+    """Compile the keys allowed for each role into the mask of their bits."""
+    return MappingProxyType(
+        {role: sum(bits[key] for key in keys) for role, keys in allowed_keys.items()}
+    )
+
+
 class PermissionManager:
     BASE_PERMISSIONS = {
         ActionType.READ: [
@@ -62,16 +108,25 @@ class PermissionManager:
         },
     }
 
+    # compiled once, the tables above must not be modified at runtime
+    ALLOWED = compile_permissions(BASE_PERMISSIONS, PERMISSIONS)
+    # a bit per (action, resource), and the permissions of each role as a mask
+    # of them, carried by the tokens
+    BITS = compile_bits(itertools.product(ActionType, ResourceType))
+    MASKS = compile_masks(ALLOWED, BITS)
+
     @staticmethod
     def has_permission(role, action, resource):
-        base_permissions = deepcopy(PermissionManager.BASE_PERMISSIONS)
         try:
-            role_permissions = PermissionManager.PERMISSIONS[role]
+            allowed = PermissionManager.ALLOWED[role]
         except KeyError:
             raise KeyError(f"Role {role} not found")
-        for permission in role_permissions:
-            base_permissions[permission].extend(role_permissions[permission])
-        return resource in base_permissions.get(action, [])
+        return (action, resource) in allowed
+
+    @staticmethod
+    def mask(*actions, resource):
+        """The bits of any of the actions on the resource."""
+        return sum(PermissionManager.BITS[(action, resource)] for action in actions)
 
 
 class FilterPermissionManager:
@@ -102,31 +157,114 @@ class FilterPermissionManager:
         },
     }
 
+    # compiled once, the table above must not be modified at runtime
+    KEYS = compile_filter_keys(FILTER_PERMISSIONS)
+    # a bit per (resource, filter name, value) of the table, in an order which
+    # doesn't depend on the hashes of the process, and the masks of the roles
+    BITS = compile_bits(
+        sorted(
+            {key for keys in KEYS.values() for key in keys},
+            key=lambda key: (key[0].value, key[1], repr(key[2])),
+        )
+    )
+    MASKS = compile_masks(KEYS, BITS)
+
     @staticmethod
     def can_use_filter(role, resource, filter_name, filter_value):
         """Checks if a role can use a specific filter
         with a given value on a specific resource."""
-        role_perms = FilterPermissionManager.FILTER_PERMISSIONS.get(role, {})
-        resource_perms = role_perms.get(resource, {})
-        allowed_values = resource_perms.get(filter_name)
+        return FilterPermissionManager.allows(
+            FilterPermissionManager.MASKS.get(role, 0),
+            resource,
+            filter_name,
+            filter_value,
+        )
 
-        # Value none means no filter by default
-        if filter_value is None:
+    @staticmethod
+    def allows(mask, resource, filter_name, filter_value):
+        """Checks if the filter mask of a token allows a specific filter with a
+        given value on a specific resource."""
+        # Value none means no filter by default, False a flag left unset
+        if filter_value is None or filter_value is False:
             return True
+        bit = FilterPermissionManager.BITS.get((resource, filter_name, filter_value))
+        return bit is not None and bool(mask & bit)
+
+
+def tables_version():
+    """Digest of the bits and masks compiled from the permission tables. A
+    token claiming another version was issued with other tables."""
+    layout = [
+        [[action.value, resource.value] for action, resource in PermissionManager.BITS],
+        [
+            [resource.value, filter_name, repr(value)]
+            for resource, filter_name, value in FilterPermissionManager.BITS
+        ],
+        [
+            [
+                role.value,
+                PermissionManager.MASKS[role],
+                FilterPermissionManager.MASKS[role],
+            ]
+            for role in RoleType
+        ],
+    ]
+    return hashlib.sha1(json.dumps(layout).encode()).hexdigest()[:8]
+
+
+PERMISSIONS_VERSION = tables_version()
+
+
+def permission_claims(role):
+    """Claims of the token of a role: its permissions and filters, as masks,
+    and the version of the tables they were computed with."""
+    return {
+        "perm_v": PERMISSIONS_VERSION,
+        "perm": PermissionManager.MASKS[role],
+        "filters": FilterPermissionManager.MASKS[role],
+    }
+
 
-        if allowed_values is None:
-            if isinstance(filter_value, bool) and filter_value is False:
-                return True
-            return False
+class AuthContext:
+    """Identity of the user running the current command, read from the token."""
 
-        if isinstance(filter_value, bool):
-            if filter_value is True:
-                return True in allowed_values
-            else:
-                return True
+    META_KEY = "epicevent.auth"
 
-        is_allowed = filter_value in allowed_values
-        return is_allowed
+    def __init__(self, token):
+        try:
+            self.id = token["id"]
+            self.role = RoleType(token["role"])
+        except KeyError as e:
+            raise ValueError(
+                f"No {e.args[0]} stocked in the current token. Try to log again."
+            )
+        self.token = token
+        # the claims of a token issued before a change of the tables, or
+        # without claims, are computed again from its role
+        if token.get("perm_v") != PERMISSIONS_VERSION:
+            token = permission_claims(self.role)
+        self.permissions = token["perm"]
+        self.filters = token["filters"]
+
+    def has_permission(self, action, resource):
+        return bool(
+            self.permissions & PermissionManager.mask(action, resource=resource)
+        )
+
+
+def get_auth_context():
+    """Return the identity of the current user.
+
+    The token is decoded and validated once per command invocation, then
+    shared through the click context by every decorator and the controller.
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None and AuthContext.META_KEY in ctx.meta:
+        return ctx.meta[AuthContext.META_KEY]
+    auth = AuthContext(util.get_token())
+    if ctx is not None:
+        ctx.meta[AuthContext.META_KEY] = auth
+    return auth
 
 
 def check_filters(resource, *filter_names):
@@ -134,17 +272,17 @@ def check_filters(resource, *filter_names):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                token = util.get_token()
-                role = RoleType(token["role"])
+                auth = get_auth_context()
             except Exception as e:
                 view.display_error(f"Authentication error: {e}")
                 return None
+            role = auth.role
 
             for name in filter_names:
                 if name in kwargs:
                     value = kwargs[name]
-                    if not FilterPermissionManager.can_use_filter(
-                        role, resource, name, value
+                    if not FilterPermissionManager.allows(
+                        auth.filters, resource, name, value
                     ):
                         view.display_error(
                             f"Role '{role.value}' does not have permission to use filter "
@@ -163,9 +301,9 @@ def login_required(pass_token=False):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                token = util.get_token()
+                auth = get_auth_context()
                 if pass_token:
-                    return func(*args, token=token, **kwargs)
+                    return func(*args, token=auth.token, **kwargs)
                 else:
                     return func(*args, **kwargs)
             except Exception as e:
@@ -178,16 +316,14 @@ def login_required(pass_token=False):
 
 
 def permission(*actions, resource):
+    required = PermissionManager.mask(*actions, resource=resource)
+
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                token = util.get_token()
-                for action in actions:
-                    if PermissionManager.has_permission(
-                        RoleType(token["role"]), action, resource
-                    ):
-                        return func(*args, **kwargs)
+                if get_auth_context().permissions & required:
+                    return func(*args, **kwargs)
                 actions_str = " or ".join(action.name for action in actions)
                 sentry_sdk.capture_exception(
                     PermissionError(
@@ -0,0 +1,76 @@
+"""Store of the login of the user, out of the .env file.
+
+The session is a small JSON file per user and configuration directory,
+readable by its owner only. A login or logout replaces it with a rename,
+atomic: concurrent terminals read the old or the new session, never a file
+written halfway, and the .env file is never rewritten. The parsed session is
+cached on the modification time of the file, reading it again costs a stat
+until it changes, e.g. on a login from another terminal.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+
+# (path, modification time, inode) of the file read last, and its data
+_cache = (None, {})
+
+
+def session_path():
+    """Path of the session file, one per user and working directory since a
+    token is only valid with the SECRET_KEY of the directory's .env file."""
+    path = os.getenv("EPICEVENT_SESSION")
+    if path:
+        return path
+    digest = hashlib.sha1(os.getcwd().encode()).hexdigest()[:12]
+    return os.path.join(os.path.expanduser("~"), ".epicevent", f"session-{digest}.json")
+
+
+def read_session():
+    """The data of the session, empty without session."""
+    global _cache
+    path = session_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    # a replaced file has a new inode, even within the resolution of mtime
+    key = (path, stat.st_mtime_ns, stat.st_ino)
+    if _cache[0] != key:
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            data = {}
+        _cache = (key, data)
+    return _cache[1]
+
+
+def write_session(data):
+    """Replace the session: the data is written to a temporary file of the
+    same directory, then renamed over the session file."""
+    path = session_path()
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # created readable by its owner only
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix=".session-")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary_path)
+        raise
+
+
+def clear_session():
+    """Remove the session, if any."""
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(session_path())
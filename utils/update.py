@@ -0,0 +1,106 @@
+import click
+from sqlalchemy import exists, update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from models.collaborator import Collaborator
+from views import view
+
+
+def parsed_by(parse):
+    """Click callback converting an option with a parser of the validator
+    module, its ValueError becoming a usage error."""
+
+    def callback(ctx, param, value):
+        if value is None:
+            return None
+        try:
+            return parse(value)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+
+    return callback
+
+
+def given(**options):
+    """The options given on the command line, those left to None dropped."""
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def check_options(values, selection, name):
+    """Display why a non-interactive update can't run and return False: it
+    needs the new values and a selection, so that the whole table is never
+    updated by mistake."""
+    if not selection:
+        view.display_error(f"Select the {name} to update with --id or --where-*.")
+        return False
+    if not values:
+        view.display_error(f"Give the new values of the {name} as options.")
+        return False
+    return True
+
+
+def matching(model, selection):
+    """Where clauses of the rows whose columns equal the selected values."""
+    return [getattr(model, column) == value for column, value in selection.items()]
+
+
+def has_role(collaborator_id, role):
+    """Where clause checking the role of a collaborator within the update."""
+    return exists().where(Collaborator.id == collaborator_id, Collaborator.role == role)
+
+
+def update_rows(session, model, values, where):
+    """Set the values on every row matching the where clauses with a single
+    UPDATE statement and return how many were updated, or None when a value
+    breaks a constraint of the table or doesn't fit its column.
+
+    The ownership and the validity of the values must be part of the where
+    clauses: no row is read beforehand. The version of the rows is increased
+    like on the updates of the ORM."""
+    stmt = (
+        update(model)
+        .where(*where)
+        .values({**values, "version_id": model.version_id + 1})
+    )
+    try:
+        count = session.execute(stmt).rowcount
+    except IntegrityError as e:
+        view.display_error(f"Invalid value: {e.orig.diag.message_detail}")
+        return None
+    except DataError as e:
+        # a string too long or a number out of range, e.g. --company or --id
+        view.display_error(f"Invalid value: {e.orig.diag.message_primary}.")
+        return None
+    session.commit()
+    return count
+
+
+def display_updated(count, name, unmatched="none matches the selection"):
+    """Report an update_rows result, name being the plural of the model."""
+    if count is None:
+        return
+    if not count:
+        view.display_error(f"No {name} updated: {unmatched}.")
+        return
+    view.display_message(f"{count} {name} updated.", "green")
+
+
+def commit_edits(session, entity, delete=False):
+    """Save, or delete, an entity read in an earlier session then edited while
+    no transaction was open, in a short transaction. Return False when the row
+    was modified by someone else since it was read: its version changed and
+    the edits are dropped."""
+    if delete:
+        session.delete(entity)
+    else:
+        session.add(entity)
+    try:
+        session.commit()
+    except StaleDataError:
+        view.display_error(
+            f"This {type(entity).__name__.lower()} has been modified by someone "
+            "else since you read it, your changes were not saved. Try again."
+        )
+        return False
+    return True
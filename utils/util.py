@@ -1,25 +1,50 @@
+import functools
 import os
+import time
+import uuid
 from datetime import UTC
 from datetime import datetime, timedelta
 
 import jwt
 from argon2 import PasswordHasher
 from jwt import ExpiredSignatureError
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
 
-from db_config import SECRET_KEY, TOKEN, reload_env
+from db_config import SECRET_KEY, env_setting, get_engine, reload_env
+from utils import session
 from views import view
 
 DEFAULT_TOKEN_EXPIRY_MINUTES = 30
+# lifetime of a login, its access tokens being refreshed without password
+REFRESH_TOKEN_EXPIRY_DAYS = 7
+
+
+@functools.cache
+def get_password_hasher():
+    """The hasher of the passwords, created once. Its cost is set by
+    ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB) and ARGON2_PARALLELISM, see
+    the calibrate-hash command, the argon2 defaults otherwise."""
+    defaults = PasswordHasher()
+    return PasswordHasher(
+        time_cost=env_setting("ARGON2_TIME_COST", defaults.time_cost, int),
+        memory_cost=env_setting("ARGON2_MEMORY_COST", defaults.memory_cost, int),
+        parallelism=env_setting("ARGON2_PARALLELISM", defaults.parallelism, int),
+    )
 
 
 def hash_password(password):
-    ph = PasswordHasher()
-    return ph.hash(password)
+    return get_password_hasher().hash(password)
 
 
 def verify_password(plain_password, hashed_password):
-    ph = PasswordHasher()
-    return ph.verify(hashed_password, plain_password)
+    return get_password_hasher().verify(hashed_password, plain_password)
+
+
+def needs_rehash(hashed_password):
+    """True when the hash wasn't made with the current cost of the hasher."""
+    return get_password_hasher().check_needs_rehash(hashed_password)
 
 
 def ask_for_input(message, validate_function=None):
@@ -50,47 +75,156 @@ def ask_for_password(message, validate_function=None):
     return value
 
 
+@functools.lru_cache(maxsize=1)
+def decode_token(token, secret_key):
+    """Verify and decode a token. The last result is kept, so long-lived
+    processes (shell) don't verify the same token for every command."""
+    return jwt.decode(token, secret_key, algorithms=["HS256"])
+
+
 def get_token():
-    if not TOKEN or not SECRET_KEY:
+    data = session.read_session()
+    token = data.get("token")
+    if not token or not SECRET_KEY:
         raise ValueError(
-            "TOKEN or SECRET_KEY not found in environment variables. "
+            "No session found or SECRET_KEY not found in environment variables. "
             "Try to log again"
         )
     try:
-        token = TOKEN
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        return payload
+        payload = decode_token(token, SECRET_KEY)
+        # the cached payload was validated earlier, its expiry may have passed since
+        if "exp" in payload and payload["exp"] <= time.time():
+            raise ExpiredSignatureError("Signature has expired")
+        return dict(payload)
     except ExpiredSignatureError:
-        raise ExpiredSignatureError("Token expired. Please log in again.")
+        if not data.get("refresh_token"):
+            raise ExpiredSignatureError("Token expired. Please log in again.")
     except Exception as e:
         raise ValueError(f"Failed to decode token: {str(e)}")
+    token = refresh_access_token(data["refresh_token"])
+    return dict(decode_token(token, SECRET_KEY))
 
 
-def create_token(collaborator):
-    secret_key = SECRET_KEY
-    if secret_key is None:
+def check_secret_key():
+    if SECRET_KEY is None:
         raise ValueError(
             "SECRET_KEY not found in environment variables. Use the init command first."
         )
+
+
+def encode_access_token(collaborator):
+    """The access token of the collaborator, carrying the permissions of their
+    role, checked by the decorators without going through the tables."""
+    # the permissions import this module
+    from utils.permissions import permission_claims
+
     payload = {
         "id": collaborator.id,
         "first_name": collaborator.first_name,
         "name": collaborator.name,
         "role": collaborator.role.value,
+        **permission_claims(collaborator.role),
         "exp": datetime.now(UTC) + timedelta(minutes=DEFAULT_TOKEN_EXPIRY_MINUTES),
     }
-    token = jwt.encode(payload=payload, key=secret_key)
-    write_env_variable("TOKEN", token)
+    return jwt.encode(payload=payload, key=SECRET_KEY)
+
+
+def create_token(collaborator):
+    """Log the collaborator in: store a short lived access token, and the
+    refresh token which replaces it once expired, until logout."""
+    check_secret_key()
+    token = encode_access_token(collaborator)
+    refresh_payload = {
+        "type": "refresh",
+        "id": collaborator.id,
+        "jti": str(uuid.uuid4()),
+        "exp": datetime.now(UTC) + timedelta(days=REFRESH_TOKEN_EXPIRY_DAYS),
+    }
+    session.write_session(
+        {"token": token, "refresh_token": jwt.encode(refresh_payload, SECRET_KEY)}
+    )
     return token
 
 
-def delete_token():
-    secret_key = SECRET_KEY
-    if secret_key is None:
-        raise ValueError(
-            "SECRET_KEY not found in environment variables. Use the init command first."
+def decode_refresh_token(refresh_token, verify_exp=True):
+    payload = jwt.decode(
+        refresh_token,
+        SECRET_KEY,
+        algorithms=["HS256"],
+        options={"verify_exp": verify_exp},
+    )
+    if payload.get("type") != "refresh":
+        raise jwt.InvalidTokenError("Not a refresh token")
+    return payload
+
+
+def refresh_access_token(refresh_token):
+    """Store a new access token minted from the refresh token, without asking
+    the password again. Its claims are read from the collaborator, who may
+    have been given another role or deleted, in the query checking that the
+    refresh token wasn't revoked.
+
+    Returns:
+        str: The new access token.
+    """
+    # the models import this module
+    from models.collaborator import Collaborator
+    from models.revoked_token import RevokedToken
+
+    try:
+        payload = decode_refresh_token(refresh_token)
+    except ExpiredSignatureError:
+        raise ExpiredSignatureError("Session expired. Please log in again.")
+    except Exception as e:
+        raise ValueError(f"Failed to decode token: {str(e)}")
+    with Session(get_engine()) as db_session:
+        collaborator = db_session.scalar(
+            select(Collaborator).where(
+                Collaborator.id == payload["id"],
+                ~exists().where(RevokedToken.jti == payload["jti"]),
+            )
+        )
+    if collaborator is None:
+        session.clear_session()
+        raise ExpiredSignatureError("Session revoked. Please log in again.")
+    token = encode_access_token(collaborator)
+    session.write_session({"token": token, "refresh_token": refresh_token})
+    return token
+
+
+def revoke_token(refresh_token):
+    """Revoke a refresh token, and purge the revoked tokens expired since,
+    refused anyway. An expired or invalid token has nothing to revoke."""
+    from models.revoked_token import RevokedToken
+
+    try:
+        payload = decode_refresh_token(refresh_token, verify_exp=False)
+    except jwt.InvalidTokenError:
+        return
+    expires_at = datetime.fromtimestamp(payload["exp"], UTC)
+    now = datetime.now(UTC)
+    if expires_at <= now:
+        return
+    with Session(get_engine()) as db_session:
+        db_session.execute(
+            insert(RevokedToken)
+            .values(jti=payload["jti"], expires_at=expires_at)
+            .on_conflict_do_nothing()
         )
-    write_env_variable("TOKEN", "")
+        db_session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        db_session.commit()
+
+
+def delete_token():
+    """Log out: revoke the refresh token, and remove the session even when
+    the revocation failed."""
+    check_secret_key()
+    refresh_token = session.read_session().get("refresh_token")
+    try:
+        if refresh_token:
+            revoke_token(refresh_token)
+    finally:
+        session.clear_session()
 
 
 def write_env_variable(var_name, var_value):
@@ -1,61 +1,214 @@
+import math
 import re
-from datetime import datetime
+from datetime import date as Date, datetime, time as Time
 
+EMAIL_PATTERN = re.compile(r"^[\w.-]+@([\w-]+\.)+[\w-]{2,4}$")
+PASSWORD_PATTERN = re.compile(
+    r"^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[^a-zA-Z0-9]).{8,}$"
+)
+NAME_PATTERN = re.compile("^[a-zA-Z- ]+$")
+PHONE_NUMBER_PATTERN = re.compile("^[0-9]{8,15}$")
+# largest value of the integer columns, ids included (int4)
+INT_MAX = 2**31 - 1
 
-def validate_email(email):
-    if not re.match(r"^[\w.-]+@([\w-]+\.)+[\w-]{2,4}$", email):
+
+# Parsers: return the typed value of a string or raise ValueError. They are
+# used by the validate_* functions of the prompts and by validate_columns.
+
+
+def parse_email(email):
+    if not EMAIL_PATTERN.match(email):
         raise ValueError("Invalid email address.")
-    return True
+    return email
 
 
-def validate_password(password):
-    if not re.match(r"^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[^a-zA-Z0-9]).{8,}$",
-                    password):
+def parse_password(password):
+    if not PASSWORD_PATTERN.match(password):
         raise ValueError("Your password must be at least 8 characters long, contains "
                          "at least one uppercase letter, at least one lowercase "
                          "letter, at least one number, and at least one special character.")
-    return True
+    return password
 
 
-def validate_name(name):
-    if not re.match("^[a-zA-Z- ]+$", name):
+def parse_name(name):
+    if not NAME_PATTERN.match(name):
         raise ValueError("Your name must be at least 1 character long and only "
                          "contains letters, spaces and -.")
-    return True
+    return name
 
 
-def validate_phone_number(phone_number):
-    if not re.match("^[0-9]{8,15}$", phone_number):
+def parse_phone_number(phone_number):
+    if not PHONE_NUMBER_PATTERN.match(phone_number):
         raise ValueError("Your phone number must be at least 8 digits long.")
-    return True
+    return phone_number
 
 
-def validate_digit(number):
+def parse_digit(number):
     if not number.isdigit():
         raise ValueError("You must enter a number.")
-    return True
+    number = int(number)
+    if number > INT_MAX:
+        raise ValueError(f"The number must be at most {INT_MAX}.")
+    return number
 
 
-def validate_decimal(number):
+def parse_decimal(number):
     try:
-        float(number.replace(',', '.'))
-        return True
+        number = float(number.replace(',', '.'))
     except ValueError:
         raise ValueError("You must enter a decimal number.")
+    # inf and nan, or a number too large for a float
+    if not math.isfinite(number):
+        raise ValueError("You must enter a decimal number.")
+    return number
 
 
-
-def validate_date(date):
+def parse_date(date):
+    # fromisoformat is fast on padded dates but also accepts other ISO forms
+    # such as yyyymmdd, strptime reads the unpadded ones such as 2025-6-1
+    if len(date) == 10 and date[4] == date[7] == "-":
+        try:
+            return Date.fromisoformat(date)
+        except ValueError:
+            pass
     try:
-        datetime.strptime(date, "%Y-%m-%d")
-        return True
+        return datetime.strptime(date, "%Y-%m-%d").date()
     except ValueError:
         raise ValueError("Your date must be yyyy-mm-dd.")
 
 
-def validate_time(time):
+def parse_time(time):
+    if len(time) == 5 and time[2] == ":":
+        try:
+            return Time.fromisoformat(time)
+        except ValueError:
+            pass
     try:
-        datetime.strptime(time, "%H:%M")
-        return True
+        return datetime.strptime(time, "%H:%M").time()
     except ValueError:
-        raise ValueError("Your time must be HH:MM.")
\ No newline at end of file
+        raise ValueError("Your time must be HH:MM.")
+
+
+def optional(parse=None):
+    """Parser of a field which may be missing, None, for validate_columns.
+    Without parse the strings are kept as they are."""
+
+    def parse_optional(value):
+        return value if parse is None else parse(value)
+
+    parse_optional.optional = True
+    return parse_optional
+
+
+def max_length(field, length, parse=None):
+    """Parser of a field of at most length characters, then parsed by parse
+    if any. The field stays optional if parse is."""
+    message = f"{field} must be at most {length} characters long."
+
+    def parse_sized(value):
+        if len(value) > length:
+            raise ValueError(message)
+        return value if parse is None else parse(value)
+
+    parse_sized.optional = getattr(parse, "optional", False)
+    return parse_sized
+
+
+def validate_email(email):
+    parse_email(email)
+    return True
+
+
+def validate_password(password):
+    parse_password(password)
+    return True
+
+
+def validate_name(name):
+    parse_name(name)
+    return True
+
+
+def validate_phone_number(phone_number):
+    parse_phone_number(phone_number)
+    return True
+
+
+def validate_digit(number):
+    parse_digit(number)
+    return True
+
+
+def validate_decimal(number):
+    parse_decimal(number)
+    return True
+
+
+def validate_date(date):
+    parse_date(date)
+    return True
+
+
+def validate_time(time):
+    parse_time(time)
+    return True
+
+
+class ValidationReport:
+    """Result of validate_columns: the typed values of each field, None where
+    invalid or missing, and the error messages of the invalid rows by index."""
+
+    def __init__(self, values, errors, size):
+        self.values = values
+        self.errors = errors
+        self.size = size
+
+    def rows(self):
+        """Yield the index and the typed values of every row."""
+        fields = list(self.values)
+        for index, row in enumerate(zip(*self.values.values())):
+            yield index, dict(zip(fields, row))
+
+
+def parse_column(field, values, parse):
+    """Return the typed values of a column and its errors by row index. A
+    missing value is an error unless the parser is optional, a None parser
+    keeps the strings as they are."""
+    required = not getattr(parse, "optional", False)
+    missing = f"Missing {field}."
+    parsed = []
+    errors = {}
+    append = parsed.append
+    for index, value in enumerate(values):
+        if value is None:
+            append(None)
+            if required:
+                errors[index] = missing
+        elif parse is None:
+            append(value)
+        else:
+            try:
+                append(parse(value))
+            except ValueError as e:
+                append(None)
+                errors[index] = str(e)
+    return parsed, errors
+
+
+def validate_columns(columns, parsers):
+    """Validate rows given by columns, the string values of each field or None
+    when missing, with the parser of each field.
+
+    Each column is parsed at once instead of each row field by field, and
+    nothing is raised: the report holds the typed values and the errors of
+    every row, in the order of the parsers.
+    """
+    size = max(map(len, columns.values()), default=0)
+    values = {}
+    errors = {}
+    for field, parse in parsers.items():
+        column = columns.get(field) or [None] * size
+        values[field], column_errors = parse_column(field, column, parse)
+        for index, message in column_errors.items():
+            errors.setdefault(index, []).append(message)
+    return ValidationReport(values, errors, size)
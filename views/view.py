@@ -11,6 +11,11 @@ def get_password(message):
     return password
 
 
+def get_command_line():
+    line = click.prompt("epicevent", prompt_suffix="> ", default="", show_default=False)
+    return line
+
+
 def display_error(message):
     click.secho(message, fg="red")
 
@@ -19,6 +24,11 @@ def display_message(message, color=None):
     click.secho(message, fg=color)
 
 
+def display_next_page(after, err=False):
+    if after is not None:
+        click.secho(f"More results with --after {after}", fg="blue", err=err)
+
+
 def display_edit_collaborator():
     choice = click.prompt(
         "1. Edit first name\n"